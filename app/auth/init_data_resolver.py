@@ -1,64 +1,94 @@
 import os
+import time
 import hashlib
 import hmac
 import json
-from urllib.parse import unquote
+import logging
+from functools import lru_cache
+from urllib.parse import parse_qsl
 
 from dotenv import load_dotenv, find_dotenv
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+
+from app.database import redis
 
 load_dotenv(find_dotenv())
 
+logger = logging.getLogger(__name__)
+
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Максимальный возраст initData (auth_date) в секундах
+INIT_DATA_MAX_AGE = int(os.getenv("INIT_DATA_MAX_AGE", 86400))
+INIT_DATA_REPLAY_PROTECTION = os.getenv("INIT_DATA_REPLAY_PROTECTION", "True").lower() in ("true", "1")
+INIT_DATA_SEEN_PREFIX = "init_data_seen:"
+
 
+@lru_cache(maxsize=8)
+def _secret_key(token: str, c_str: str = "WebAppData") -> bytes:
+    """HMAC-ключ WebAppData считается один раз на токен бота."""
+    return hmac.new(c_str.encode(), token.encode(), hashlib.sha256).digest()
 
-def validate(hash_str, init_data, token, c_str="WebAppData"):
+
+def _parse_init_data(init_data: str) -> tuple:
     """
-    Validates the data received from the Telegram web app, using the
-    method documented here: 
-    https://core.telegram.org/bots/webapps#validating-data-received-via-the-web-app
-
-    hash_str - the hash string passed by the webapp
-    init_data - the query string passed by the webapp
-    token - Telegram bot's token
-    c_str - constant string (default = "WebAppData")
+    Разбирает initData за один проход.
+    Возвращает (hash, data_check_string, params).
     """
-    init_data = sorted([chunk.split("=") 
-          for chunk in unquote(init_data).split("&") 
-            if chunk[:len("hash=")]!="hash="],
-        key=lambda x: x[0])
-    init_data = "\n".join([f"{rec[0]}={rec[1]}" for rec in init_data])
+    params = dict(parse_qsl(init_data, keep_blank_values=True))
+    hash_from_tg = params.pop("hash", None)
+    data_check = "\n".join(f"{k}={params[k]}" for k in sorted(params))
+    return hash_from_tg, data_check, params
 
-    secret_key = hmac.new(c_str.encode(), token.encode(), hashlib.sha256).digest()
-    data_check = hmac.new(secret_key, init_data.encode(), hashlib.sha256)
-    return data_check.hexdigest() == hash_str
 
 def verify_telegram_init_data(init_data: str, bot_token: str = BOT_TOKEN, c_str: str = "WebAppData") -> dict:
     """
     Проверяет подпись Telegram WebApp initData по актуальным рекомендациям Telegram.
     Возвращает dict всех параметров (user будет уже декодирован как объект).
-    Использует validate() для проверки подписи.
+    Строка разбирается один раз, ключ бота кэшируется, хэши сравниваются
+    за постоянное время, auth_date не должен быть старше INIT_DATA_MAX_AGE.
     """
-    params = [chunk.split("=", 1) for chunk in unquote(init_data).split("&") if chunk]
-    hash_from_tg = None
-    filtered_params = []
-    for k, v in params:
-        if k == "hash":
-            hash_from_tg = v
-        elif k != "signature":
-            filtered_params.append((k, v))
+    hash_from_tg, data_check, params = _parse_init_data(init_data)
     if not hash_from_tg:
-        raise Exception("No hash in initData")
-    
-    # Проверяем подпись через validate
-    if not validate(hash_from_tg, init_data, bot_token, c_str=c_str):
-        raise Exception("Invalid signature in initData (validate)")
-
-    # Если подпись валидна, продолжаем как раньше:
-    filtered_params.sort(key=lambda x: x[0])
-    out = dict(filtered_params)
-    if "user" in out:
+        raise HTTPException(status_code=401, detail="No hash in initData")
+
+    data_hash = hmac.new(_secret_key(bot_token, c_str), data_check.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(data_hash, hash_from_tg):
+        raise HTTPException(status_code=401, detail="Invalid signature in initData")
+
+    try:
+        auth_date = int(params.get("auth_date", ""))
+    except ValueError:
+        raise HTTPException(status_code=401, detail="No auth_date in initData")
+    if time.time() - auth_date > INIT_DATA_MAX_AGE:
+        raise HTTPException(status_code=401, detail="initData expired")
+
+    params.pop("signature", None)
+    params["hash"] = hash_from_tg
+    if "user" in params:
         try:
-            out["user"] = json.loads(out["user"])
+            params["user"] = json.loads(params["user"])
         except Exception:
             pass
-    return out
\ No newline at end of file
+    return params
+
+
+async def mark_init_data_used(params: dict) -> None:
+    """
+    Защита от повторного использования: hash проверенного initData запоминается
+    в Redis на INIT_DATA_MAX_AGE, повторный запрос с тем же initData отклоняется.
+    Вызывается после всех проверок, которые могут отклонить запрос, иначе
+    клиент, повторивший отклонённый запрос, получит "initData already used".
+
+    Если Redis недоступен, проверка пропускается (как и лимиты запросов):
+    авторизация не должна зависеть от Redis, подпись и auth_date уже проверены.
+    """
+    if not INIT_DATA_REPLAY_PROTECTION:
+        return
+    try:
+        first_use = await redis.set(f"{INIT_DATA_SEEN_PREFIX}{params['hash']}", "1", nx=True, ex=INIT_DATA_MAX_AGE)
+    except RedisError as e:
+        logger.warning("initData replay protection unavailable, letting request through: %s", e)
+        return
+    if not first_use:
+        raise HTTPException(status_code=401, detail="initData already used")
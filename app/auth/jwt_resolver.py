@@ -1,17 +1,120 @@
+import os
+import time
+import hashlib
+import logging
 import jwt
 
+from collections import OrderedDict
 from fastapi import Header, HTTPException
+from redis.exceptions import RedisError
 
 from app.auth import JWT_ALGORITHM, JWT_SECRET
+from app.database import redis
+from app.utils.metrics import cache_requests
 
-def get_user_from_jwt(authorization: str = Header(...)):
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", 4096))
+# Для токенов без exp (confirm-code, test-token) запись живёт не дольше этого TTL
+JWT_CACHE_TTL = int(os.getenv("JWT_CACHE_TTL", 300))
+# Общий уровень в Redis: отзыв токена (POST /users/logout), видимый всем воркерам.
+# Стоит один EXISTS на запрос; если Redis недоступен, проверка пропускается
+# (как и ограничитель запросов): отказ Redis не должен закрывать весь API
+JWT_CACHE_SHARED = os.getenv("JWT_CACHE_SHARED", "False").lower() in ("true", "1")
+JWT_REVOKED_PREFIX = "jwt_revoked:"
+# Срок пометки отзыва для токенов без exp
+JWT_REVOKED_TTL = 2 * 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+_jwt_cache: "OrderedDict[str, tuple]" = OrderedDict()
+jwt_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _cache_get(digest: str):
+    entry = _jwt_cache.get(digest)
+    if entry is None:
+        return None
+    payload, expires_at = entry
+    if expires_at <= time.time():
+        _jwt_cache.pop(digest, None)
+        return None
+    _jwt_cache.move_to_end(digest)
+    return payload
+
+
+def _cache_put(digest: str, payload: dict) -> None:
+    expires_at = time.time() + JWT_CACHE_TTL
+    if isinstance(payload.get("exp"), (int, float)):
+        expires_at = min(expires_at, payload["exp"])
+    _jwt_cache[digest] = (payload, expires_at)
+    _jwt_cache.move_to_end(digest)
+    while len(_jwt_cache) > JWT_CACHE_SIZE:
+        _jwt_cache.popitem(last=False)
+
+
+def get_jwt_cache_stats() -> dict:
+    total = jwt_cache_stats["hits"] + jwt_cache_stats["misses"]
+    return {
+        **jwt_cache_stats,
+        "size": len(_jwt_cache),
+        "hit_ratio": jwt_cache_stats["hits"] / total if total else 0.0,
+    }
+
+
+async def revoke_token(token: str, expires_at=None) -> None:
+    """
+    Отзывает токен: убирает его из локального кэша и, если включён
+    общий уровень, помечает отозванным в Redis для всех воркеров до его exp.
+    Бросает HTTPException 503, если пометку не удалось записать.
+    """
+    digest = _token_digest(token)
+    _jwt_cache.pop(digest, None)
+    if not JWT_CACHE_SHARED:
+        return
+    ttl = int(expires_at - time.time()) if isinstance(expires_at, (int, float)) else JWT_REVOKED_TTL
+    if ttl <= 0:
+        return
+    try:
+        await redis.set(f"{JWT_REVOKED_PREFIX}{digest}", "1", ex=ttl)
+    except RedisError as e:
+        logger.error("Failed to revoke token: %s", e)
+        raise HTTPException(status_code=503, detail="Token revocation unavailable")
+
+
+async def _is_revoked(digest: str) -> bool:
+    try:
+        return bool(await redis.exists(f"{JWT_REVOKED_PREFIX}{digest}"))
+    except RedisError as e:
+        logger.warning("Token revocation check unavailable, skipping: %s", e)
+        return False
+
+
+async def get_user_from_jwt(authorization: str = Header(...)):
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid token header")
     token = authorization[7:]
+    digest = _token_digest(token)
+
+    if JWT_CACHE_SHARED and await _is_revoked(digest):
+        _jwt_cache.pop(digest, None)
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    payload = _cache_get(digest)
+    if payload is not None:
+        jwt_cache_stats["hits"] += 1
+        cache_requests.inc("jwt", "hit")
+        return dict(payload)
+
+    jwt_cache_stats["misses"] += 1
+    cache_requests.inc("jwt", "miss")
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid token")
+    _cache_put(digest, payload)
+    return dict(payload)
@@ -1,2 +1,6 @@
 from .database import *
-from .in_memory import *
\ No newline at end of file
+from .in_memory import *
+from .changes import *
+from .archive import *
+from .indexes import *
+from .users_repository import *
@@ -0,0 +1,86 @@
+import os
+import asyncio
+import logging
+
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne, DeleteOne
+
+from app.database.database import db, collection
+
+__all__ = ["archive_collection", "archive_reports"]
+
+logger = logging.getLogger(__name__)
+
+archive_collection = db["task_reports_archive"]
+
+# Удалённые отчёты переезжают в архив через столько дней после удаления
+# (клиенты дельта-синхронизации, не заходившие дольше, не увидят их удаление)
+ARCHIVE_DELETED_GRACE_DAYS = int(os.getenv("ARCHIVE_DELETED_GRACE_DAYS", 30))
+# Живые отчёты старше горизонта (по created_at) тоже уходят в архив; 0 — не переносить.
+# По умолчанию выключено: экспорт, поиск, история задачи и аналитика читают только
+# рабочую коллекцию, архив видят лишь GET /tasks/reports и /tasks/reports/{report_id} с include_archived
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", 0))
+# Через сколько дней после архивации TTL-индекс удалит отчёт; 0 — хранить вечно
+ARCHIVE_DELETED_RETENTION_DAYS = int(os.getenv("ARCHIVE_DELETED_RETENTION_DAYS", 90))
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", 0))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+
+
+def _archive_conditions(now: datetime) -> list:
+    conditions = [{"is_deleted": True, "deleted_at": {"$lt": now - timedelta(days=ARCHIVE_DELETED_GRACE_DAYS)}}]
+    if ARCHIVE_HORIZON_DAYS > 0:
+        conditions.append({"created_at": {"$lt": now - timedelta(days=ARCHIVE_HORIZON_DAYS)}})
+    return conditions
+
+
+def _purge_at(report: dict, now: datetime):
+    days = ARCHIVE_DELETED_RETENTION_DAYS if report.get("is_deleted") else ARCHIVE_RETENTION_DAYS
+    return now + timedelta(days=days) if days > 0 else None
+
+
+async def archive_reports(batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Переносит удалённые (после ARCHIVE_DELETED_GRACE_DAYS) и, если задан
+    ARCHIVE_HORIZON_DAYS, старые отчёты из task_reports в task_reports_archive батчами.
+
+    Каждый батч сначала копируется в архив (ReplaceOne с upsert, поэтому
+    повторный прогон после обрыва безопасен), затем удаляется из рабочей
+    коллекции с условием на change_seq (его меняет любая запись отчёта, включая
+    удаление и обогащение из трекера, в отличие от version): отчёт, изменённый
+    между копией и удалением, остаётся на месте, а его архивная копия перезапишется при
+    следующем прогоне. Возвращает количество перенесённых отчётов.
+    """
+    now = datetime.utcnow()
+    query = {"$or": _archive_conditions(now)}
+    moved = 0
+    last_id = None
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        batch = await collection.find(batch_query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        copies = []
+        for report in batch:
+            archived = {**report, "archived_at": now}
+            purge_at = _purge_at(report, now)
+            if purge_at is not None:
+                archived["purge_at"] = purge_at
+            copies.append(ReplaceOne({"_id": report["_id"]}, archived, upsert=True))
+        await archive_collection.bulk_write(copies, ordered=False)
+
+        result = await collection.bulk_write(
+            [DeleteOne({"_id": report["_id"], "change_seq": report.get("change_seq")}) for report in batch],
+            ordered=False,
+        )
+        moved += result.deleted_count
+        logger.info("Archived reports up to %s (%d moved so far)", last_id, moved)
+    return moved
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Archived {asyncio.run(archive_reports())} reports")
@@ -0,0 +1,55 @@
+import os
+
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+
+from app.database.database import db
+
+__all__ = ["next_change_seq", "change_stamp", "server_time", "settled_before", "REPORT_CHANGES_COUNTER"]
+
+counters_collection = db["counters"]
+
+REPORT_CHANGES_COUNTER = "task_reports_changes"
+# Номера выдаются подряд, но запись с номером может стать видимой позже
+# записи со следующим (медленный insert_many). Поэтому лента изменений
+# останавливается на первом пропуске в номерах, пока изменение после
+# пропуска моложе этого окна. Пропуски старше окна считаются постоянными:
+# номер переписан следующей правкой, запись не удалась или отчёт в архиве.
+CHANGES_SETTLE_MS = int(os.getenv("CHANGES_SETTLE_MS", 2000))
+
+
+async def next_change_seq(count: int = 1) -> tuple:
+    """
+    Резервирует count номеров монотонной последовательности изменений отчётов
+    (атомарный $inc в коллекции counters). Возвращает (первый номер, время
+    резервирования по часам сервера Mongo), чтобы changed_at не зависел от
+    часов воркера. Хранится в Mongo, а не в Redis, чтобы последовательность
+    не сбрасывалась.
+
+    Цена: каждая запись отчёта делает лишний round trip к одному документу
+    счётчика (общая точка записи для всех воркеров). Номер резервируется до
+    записи отчёта, поэтому не прошедшая запись (404, 412 на If-Match) оставляет
+    пропуск, который лента изменений пропускает через CHANGES_SETTLE_MS.
+    """
+    counter = await counters_collection.find_one_and_update(
+        {"_id": REPORT_CHANGES_COUNTER},
+        {"$inc": {"seq": count}, "$currentDate": {"changed_at": True}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["seq"] - count + 1, counter["changed_at"]
+
+
+async def change_stamp() -> dict:
+    """Поля, которые каждая запись отчёта выставляет вместе с изменением."""
+    change_seq, changed_at = await next_change_seq()
+    return {"change_seq": change_seq, "changed_at": changed_at}
+
+
+async def server_time() -> datetime:
+    """Текущее время по часам сервера Mongo (в той же шкале, что и changed_at)."""
+    return (await db.command("hello"))["localTime"]
+
+
+def settled_before(now: datetime) -> datetime:
+    return now - timedelta(milliseconds=CHANGES_SETTLE_MS)
@@ -1,7 +1,72 @@
 import os
+import time
+import asyncio
+import logging
+
 from redis.asyncio import Redis
 
+from app.utils.metrics import redis_command_duration
+
+logger = logging.getLogger(__name__)
+
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 100))
+# Таймаут команд клиента запросов (лимиты, кэш ленты, отметки initData):
+# зависший Redis не должен подвешивать запросы; 0 — без таймаута
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5)) or None
+# Подписки pub/sub (sockets, report_events) живут на отдельном клиенте без
+# таймаута чтения, иначе обрывались бы в паузах между сообщениями
+REDIS_PUBSUB_MAX_CONNECTIONS = int(os.getenv("REDIS_PUBSUB_MAX_CONNECTIONS", 10))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_WARMUP_CONNECTIONS = int(os.getenv("REDIS_WARMUP_CONNECTIONS", 10))
+
+
+class InstrumentedRedis(Redis):
+    """Redis-клиент, который пишет время каждой команды в redis_command_duration."""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            redis_command_duration.observe(time.perf_counter() - started, str(args[0]).upper(), status)
+
+
+redis = InstrumentedRedis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    decode_responses=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+)
+
+pubsub_redis = InstrumentedRedis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    decode_responses=True,
+    max_connections=REDIS_PUBSUB_MAX_CONNECTIONS,
+    socket_timeout=None,
+    socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+)
+
+
+async def warm_up_redis() -> None:
+    connections = min(REDIS_WARMUP_CONNECTIONS, REDIS_MAX_CONNECTIONS)
+    if connections <= 0:
+        return
+    await asyncio.gather(*(redis.ping() for _ in range(connections)))
+    logger.info("Redis pool warmed up with %d connections", connections)
+
 
-redis = Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+async def close_redis() -> None:
+    await redis.aclose()
+    await pubsub_redis.aclose()
@@ -0,0 +1,189 @@
+import os
+import logging
+
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+
+from app.database.database import collection, users_collection
+from app.database.archive import archive_collection
+
+__all__ = ["ensure_indexes", "explain_router_queries"]
+
+logger = logging.getLogger(__name__)
+
+NOT_DELETED = {"is_deleted": {"$ne": True}}
+
+# Язык стемминга полнотекстового индекса (Mongo допускает один text-индекс на
+# коллекцию; при смене языка старый индекс нужно удалить вручную)
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "russian")
+
+# Индексы повторяют формы запросов роутеров: фильтр по равенству идёт первым,
+# затем ключи сортировки (created_at, _id) для keyset-пагинации.
+# partialFilterExpression не поддерживает $ne, поэтому "is_deleted != true"
+# остаётся остаточным фильтром поверх этих индексов.
+USERS_INDEXES = [
+    IndexModel([("chat_id", ASCENDING)], name="chat_id_unique", unique=True),
+]
+
+# Без этих индексов приложение работает некорректно (get_or_create_user
+# полагается на уникальность chat_id), поэтому без них оно не стартует
+REQUIRED_INDEXES = {"chat_id_unique"}
+
+REPORTS_INDEXES = [
+    IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="feed_created_at"),
+    IndexModel(
+        [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="owner_created_at",
+    ),
+    IndexModel(
+        [("date", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="date_created_at",
+    ),
+    # Ключи повтора пакетной отправки уникальны в пределах пользователя
+    IndexModel(
+        [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+        name="owner_idempotency_key",
+        unique=True,
+        partialFilterExpression={"idempotency_key": {"$type": "string"}},
+    ),
+    # Поиск удалённых отчётов для архивации (частичный: только is_deleted = true)
+    IndexModel(
+        [("deleted_at", ASCENDING)],
+        name="deleted_at_archival",
+        partialFilterExpression={"is_deleted": True},
+    ),
+    # Лента изменений /tasks/reports/changes идёт по номеру изменения
+    IndexModel([("change_seq", ASCENDING)], name="change_seq"),
+    # Полнотекстовый поиск /tasks/search по описаниям задач и имени разработчика
+    IndexModel(
+        [
+            *[(f"{bucket}.{field}", TEXT) for bucket in ("yesterday", "today", "blockers") for field in ("description", "task_id")],
+            ("developer", TEXT),
+        ],
+        name="reports_text",
+        default_language=SEARCH_LANGUAGE,
+        weights={
+            **{f"{bucket}.description": 5 for bucket in ("yesterday", "today", "blockers")},
+            **{f"{bucket}.task_id": 3 for bucket in ("yesterday", "today", "blockers")},
+            "developer": 1,
+        },
+    ),
+    # Multikey-индексы по task_id внутри блоков: по одному на массив,
+    # т.к. составной индекс не может покрывать два массива сразу.
+    *[
+        IndexModel(
+            [(f"{bucket}.task_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name=f"{bucket}_task_id",
+        )
+        for bucket in ("yesterday", "today", "blockers")
+    ],
+]
+
+# Архив читается только через include_archived (те же формы запросов, что и
+# лента) и чистится TTL-индексом по purge_at
+ARCHIVE_INDEXES = [
+    IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="feed_created_at"),
+    IndexModel(
+        [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="owner_created_at",
+    ),
+    IndexModel(
+        [("date", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="date_created_at",
+    ),
+    IndexModel([("purge_at", ASCENDING)], name="purge_at_ttl", expireAfterSeconds=0),
+]
+
+
+async def ensure_indexes() -> None:
+    """
+    Создаёт индексы коллекций users, task_reports и task_reports_archive. Вызывается на старте приложения.
+    Индексы создаются по одному: ошибка одного (например, text-индекс после смены
+    SEARCH_LANGUAGE) не мешает остальным. Если не создался индекс из REQUIRED_INDEXES
+    (дубликаты chat_id), бросает RuntimeError: их убирает python -m app.database.migrations.
+    """
+    failed_required = []
+    for coll, models in (
+        (users_collection, USERS_INDEXES),
+        (collection, REPORTS_INDEXES),
+        (archive_collection, ARCHIVE_INDEXES),
+    ):
+        names = []
+        for model in models:
+            name = model.document["name"]
+            try:
+                names.extend(await coll.create_indexes([model]))
+            except PyMongoError as e:
+                logger.error("Failed to create index %s on %s: %s", name, coll.name, e)
+                if name in REQUIRED_INDEXES:
+                    failed_required.append(name)
+        logger.info("Indexes ensured on %s: %s", coll.name, ", ".join(names))
+
+    if failed_required:
+        raise RuntimeError(
+            f"Required indexes are missing: {', '.join(failed_required)}; "
+            "run `python -m app.database.migrations` to remove duplicates"
+        )
+
+
+def _plan_indexes(plan: dict) -> list:
+    """Рекурсивно собирает имена индексов из winningPlan (или COLLSCAN)."""
+    found = []
+    stage = plan.get("stage")
+    if stage == "IXSCAN":
+        found.append(plan.get("indexName"))
+    elif stage == "COLLSCAN":
+        found.append("COLLSCAN")
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            found.extend(_plan_indexes(plan[key]))
+    for child in plan.get("inputStages", []):
+        found.extend(_plan_indexes(child))
+    return found
+
+
+def _router_queries() -> dict:
+    """Формы запросов, которые выполняют роутеры (значения — заглушки)."""
+    oid = ObjectId()
+    feed_sort = [("created_at", DESCENDING), ("_id", DESCENDING)]
+    return {
+        "users.auth_by_chat_id": (users_collection, {"chat_id": "0"}, None),
+        "tasks.get_reports": (collection, dict(NOT_DELETED), feed_sort),
+        "tasks.get_reports[owner_id]": (collection, {**NOT_DELETED, "user_id": oid}, feed_sort),
+        "tasks.get_reports[date]": (
+            collection,
+            {**NOT_DELETED, "date": {"$gte": datetime(1970, 1, 1), "$lt": datetime(1970, 1, 8)}},
+            feed_sort,
+        ),
+        "tasks.get_task_timeline": (
+            collection,
+            {"$and": [NOT_DELETED, {"$or": [{f"{b}.task_id": "0"} for b in ("yesterday", "today", "blockers")]}]},
+            feed_sort,
+        ),
+        "tasks.search_reports": (collection, {"$text": {"$search": "0"}, **NOT_DELETED}, None),
+        "tasks.get_report_changes": (collection, {"change_seq": {"$gt": 0}}, [("change_seq", ASCENDING)]),
+        "users.get_my_profile[latest_report]": (
+            collection,
+            {**NOT_DELETED, "user_id": oid, "developer": {"$exists": True, "$ne": ""}},
+            [("created_at", DESCENDING)],
+        ),
+    }
+
+
+async def explain_router_queries() -> dict:
+    """
+    Прогоняет explain для каждой формы запроса и возвращает
+    {имя запроса: [использованные индексы]}.
+    """
+    report = {}
+    for name, (coll, query, sort) in _router_queries().items():
+        cursor = coll.find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        report[name] = _plan_indexes(plan) or ["UNKNOWN"]
+    return report
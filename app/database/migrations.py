@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+
+from datetime import datetime
+from pymongo import UpdateOne
+
+from app.database.database import db, collection, users_collection
+from app.database.archive import archive_collection
+from app.database.changes import next_change_seq
+from app.database.users_repository import compute_user_report_stats, report_stats_update
+
+logger = logging.getLogger(__name__)
+
+migrations_collection = db["migrations"]
+
+DATE_FIELDS = ("date", "created_at", "updated_at", "deleted_at")
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 500))
+
+
+def _parse_iso(value: str):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+async def migrate_report_dates(batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Переводит строковые isoformat-даты отчётов в нативные BSON datetime.
+
+    Идёт по _id батчами и сохраняет последний обработанный _id в коллекции
+    migrations, поэтому после обрыва продолжает с того же места. Повторный
+    запуск безопасен: выбираются только документы, где поле ещё строка.
+    Возвращает количество изменённых документов.
+    """
+    name = "report_dates_to_datetime"
+    state = await migrations_collection.find_one({"_id": name}) or {}
+    last_id = state.get("last_id")
+
+    string_dated = {"$or": [{field: {"$type": "string"}} for field in DATE_FIELDS]}
+    modified = 0
+    while True:
+        query = dict(string_dated)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, {field: 1 for field in DATE_FIELDS}) \
+            .sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        ops = []
+        for doc in batch:
+            update = {}
+            for field in DATE_FIELDS:
+                if isinstance(doc.get(field), str):
+                    parsed = _parse_iso(doc[field])
+                    if parsed is not None:
+                        update[field] = parsed
+                    else:
+                        logger.warning("Unparsable %s=%r in report %s", field, doc[field], doc["_id"])
+            if update:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        if ops:
+            result = await collection.bulk_write(ops, ordered=False)
+            modified += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        await migrations_collection.update_one(
+            {"_id": name},
+            {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        logger.info("Migrated batch up to %s (%d modified so far)", last_id, modified)
+
+    await migrations_collection.update_one(
+        {"_id": name},
+        {"$set": {"finished_at": datetime.utcnow()}, "$unset": {"last_id": ""}},
+        upsert=True,
+    )
+    return modified
+
+
+async def backfill_user_report_stats(batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Заполняет last_developer_name, last_report_at и reports_count у пользователей,
+    для которых они ещё не посчитаны. Как и migrate_report_dates, идёт по _id
+    батчами с чекпоинтом в migrations. Возвращает количество обновлённых пользователей.
+    """
+    name = "user_report_stats"
+    state = await migrations_collection.find_one({"_id": name}) or {}
+    last_id = state.get("last_id")
+
+    updated = 0
+    while True:
+        query = {"reports_count": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await users_collection.find(query, {"_id": 1}) \
+            .sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        stats = await asyncio.gather(*(compute_user_report_stats(user["_id"]) for user in batch))
+        # Условие на $exists: не затираем значения, которые успел посчитать профиль
+        ops = [
+            UpdateOne({"_id": user["_id"], "reports_count": {"$exists": False}}, report_stats_update(user_stats))
+            for user, user_stats in zip(batch, stats)
+        ]
+        result = await users_collection.bulk_write(ops, ordered=False)
+        updated += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        await migrations_collection.update_one(
+            {"_id": name},
+            {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        logger.info("Backfilled users up to %s (%d updated so far)", last_id, updated)
+
+    await migrations_collection.update_one(
+        {"_id": name},
+        {"$set": {"finished_at": datetime.utcnow()}, "$unset": {"last_id": ""}},
+        upsert=True,
+    )
+    return updated
+
+
+async def backfill_report_change_seq(batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Нумерует отчёты, созданные до появления ленты изменений, чтобы первая
+    синхронизация через /tasks/reports/changes (без since) отдала их все.
+    Номера выдаются из общей последовательности, поэтому параллельные записи
+    приложения не конфликтуют с бэкфиллом. Возвращает количество пронумерованных отчётов.
+    """
+    numbered = 0
+    while True:
+        batch = await collection.find({"change_seq": {"$exists": False}}, {"_id": 1}) \
+            .sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        first_seq, changed_at = await next_change_seq(len(batch))
+        ops = [
+            UpdateOne(
+                {"_id": doc["_id"], "change_seq": {"$exists": False}},
+                {"$set": {"change_seq": first_seq + offset, "changed_at": changed_at}},
+            )
+            for offset, doc in enumerate(batch)
+        ]
+        result = await collection.bulk_write(ops, ordered=False)
+        numbered += result.modified_count
+        logger.info("Numbered reports up to %s (%d so far)", batch[-1]["_id"], numbered)
+    return numbered
+
+
+async def dedupe_users_by_chat_id() -> int:
+    """
+    Сливает пользователей с одинаковым chat_id (появлялись при параллельных
+    логинах до уникального индекса chat_id_unique, без которого приложение не
+    стартует). Остаётся самый ранний документ; отчёты дубликатов (в том числе
+    архивные) переносятся на него, статистика профиля пересчитывается.
+    Токены, выданные дубликатам, продолжают работать до exp, но их новые
+    отчёты снова окажутся под старым user_id, поэтому миграцию стоит запускать
+    до выкладки. Возвращает количество удалённых дубликатов.
+    """
+    groups = await users_collection.aggregate([
+        {"$group": {"_id": "$chat_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]).to_list(length=None)
+
+    removed = 0
+    for group in groups:
+        keeper, *duplicates = sorted(group["ids"])
+        for coll in (collection, archive_collection):
+            await coll.update_many({"user_id": {"$in": duplicates}}, {"$set": {"user_id": keeper}})
+        result = await users_collection.delete_many({"_id": {"$in": duplicates}})
+        removed += result.deleted_count
+        await users_collection.update_one(
+            {"_id": keeper}, report_stats_update(await compute_user_report_stats(keeper)),
+        )
+        logger.info("Merged %d duplicate users for chat_id %s into %s", len(duplicates), group["_id"], keeper)
+    return removed
+
+
+async def run_all() -> None:
+    print(f"Removed {await dedupe_users_by_chat_id()} duplicate users")
+    print(f"Converted {await migrate_report_dates()} reports")
+    print(f"Numbered {await backfill_report_change_seq()} reports for delta sync")
+    print(f"Backfilled report stats for {await backfill_user_report_stats()} users")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_all())
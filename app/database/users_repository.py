@@ -0,0 +1,151 @@
+import os
+import time
+
+from collections import OrderedDict
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.database.database import users_collection, collection
+from app.database.archive import archive_collection
+from app.utils.metrics import cache_requests
+
+__all__ = [
+    "get_or_create_user",
+    "clear_user_id_cache",
+    "compute_user_report_stats",
+    "refresh_user_report_stats",
+    "report_stats_update",
+    "record_reports_created",
+    "record_report_updated",
+    "USER_PROFILE_PROJECTION",
+]
+
+USER_ID_CACHE_TTL = int(os.getenv("USER_ID_CACHE_TTL", 300))
+USER_ID_CACHE_SIZE = int(os.getenv("USER_ID_CACHE_SIZE", 10000))
+
+# Денормализованные поля профиля в документе пользователя. Пока reports_count
+# отсутствует, статистика не посчитана: записи отчётов её не трогают, а
+# профиль/бэкфилл считают её целиком (refresh_user_report_stats)
+USER_PROFILE_PROJECTION = {"full_name": 1, "last_developer_name": 1, "last_report_at": 1, "reports_count": 1}
+
+_user_id_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def clear_user_id_cache() -> None:
+    _user_id_cache.clear()
+
+
+async def get_or_create_user(chat_id, username=None, full_name=None, referred_by=None) -> ObjectId:
+    """
+    Находит пользователя по chat_id или создаёт его за один запрос
+    (find_one_and_update с upsert). Уникальный индекс chat_id_unique
+    гарантирует, что параллельные логины не создадут дубликат.
+    Недавние chat_id -> _id отдаются из кэша без обращения к Mongo.
+    """
+    chat_id = str(chat_id)
+    cached = _user_id_cache.get(chat_id)
+    if cached and cached[1] > time.time():
+        _user_id_cache.move_to_end(chat_id)
+        cache_requests.inc("user_id", "hit")
+        return cached[0]
+    cache_requests.inc("user_id", "miss")
+
+    user_data = {
+        "chat_id": chat_id,
+        "username": username,
+        "full_name": full_name,
+        "created_at": datetime.utcnow(),
+    }
+    if referred_by is not None:
+        user_data["referred_by"] = referred_by
+
+    try:
+        user = await users_collection.find_one_and_update(
+            {"chat_id": chat_id},
+            {"$setOnInsert": user_data},
+            projection={"_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Параллельный upsert успел вставить документ первым
+        user = await users_collection.find_one({"chat_id": chat_id}, {"_id": 1})
+
+    # LRU, как и _jwt_cache: вытесняется самая давняя запись, а не весь кэш сразу
+    _user_id_cache[chat_id] = (user["_id"], time.time() + USER_ID_CACHE_TTL)
+    _user_id_cache.move_to_end(chat_id)
+    while len(_user_id_cache) > USER_ID_CACHE_SIZE:
+        _user_id_cache.popitem(last=False)
+    return user["_id"]
+
+
+async def compute_user_report_stats(user_oid: ObjectId) -> dict:
+    """
+    Считает поля профиля по отчётам пользователя (индекс owner_created_at).
+    Архивные неудалённые отчёты тоже входят в счётчик, а последние отчёты
+    ищутся в архиве, только если в рабочей коллекции их нет.
+    """
+    active = {"user_id": user_oid, "is_deleted": {"$ne": True}}
+    named = {**active, "developer": {"$exists": True, "$ne": ""}}
+    reports_count = await collection.count_documents(active) + await archive_collection.count_documents(active)
+    latest = None
+    latest_named = None
+    for coll in (collection, archive_collection):
+        latest = latest or await coll.find_one(active, {"created_at": 1}, sort=[("created_at", -1)])
+        latest_named = latest_named or await coll.find_one(named, {"developer": 1}, sort=[("created_at", -1)])
+        if latest and latest_named:
+            break
+    return {
+        "reports_count": reports_count,
+        "last_report_at": latest.get("created_at") if latest else None,
+        "last_developer_name": latest_named.get("developer") if latest_named else None,
+    }
+
+
+def report_stats_update(stats: dict) -> dict:
+    """Update-документ для статистики: пустые поля снимаются, а не пишутся как null."""
+    update = {"$set": {key: value for key, value in stats.items() if value is not None}}
+    unset = {key: "" for key, value in stats.items() if value is None}
+    if unset:
+        update["$unset"] = unset
+    return update
+
+
+async def refresh_user_report_stats(user_oid: ObjectId) -> dict:
+    stats = await compute_user_report_stats(user_oid)
+    await users_collection.update_one({"_id": user_oid}, report_stats_update(stats))
+    return stats
+
+
+async def record_reports_created(user_id, reports: list) -> None:
+    """
+    Учитывает новые отчёты пользователя одним атомарным update_one:
+    счётчик через $inc, время последнего отчёта через $max.
+    """
+    if not reports:
+        return
+    latest = max(reports, key=lambda report: report["created_at"])
+    update = {
+        "$inc": {"reports_count": len(reports)},
+        "$max": {"last_report_at": latest["created_at"]},
+    }
+    named = [report for report in reports if report.get("developer")]
+    if named:
+        update["$set"] = {"last_developer_name": max(named, key=lambda report: report["created_at"])["developer"]}
+    await users_collection.update_one({"_id": ObjectId(user_id), "reports_count": {"$exists": True}}, update)
+
+
+async def record_report_updated(user_id, report: dict) -> None:
+    """Новое имя разработчика попадает в профиль, только если правился последний отчёт."""
+    if report.get("created_at") is None:
+        return
+    if not report.get("developer"):
+        # Имя стёрто: последним непустым может оказаться любой из прошлых отчётов
+        await refresh_user_report_stats(ObjectId(user_id))
+        return
+    await users_collection.update_one(
+        {"_id": ObjectId(user_id), "last_report_at": {"$lte": report["created_at"]}},
+        {"$set": {"last_developer_name": report["developer"]}},
+    )
@@ -1,16 +1,62 @@
 import os
+import hmac
+import asyncio
+import logging
 
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv, find_dotenv
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 
-from app.routers import service, sockets, task, users
+from app.routers import analytics, service, sockets, task, users
+from app.routers.sockets import active_connections, start_login_listener, stop_login_listener
+from app.utils.report_events import start_report_events_listener, stop_report_events_listener, subscribers
+from app.utils.enrich_task import stop_enrichment
+from app.utils.archiver import start_archiver, stop_archiver
+from app.utils.tracker import close_tracker
+from app.utils.metrics import Gauge, MetricsMiddleware, render_metrics
+from app.database import (
+    client, redis, close_mongo, close_redis, ensure_indexes, explain_router_queries, warm_up_mongo, warm_up_redis,
+)
 
 load_dotenv(find_dotenv())
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", 2))
+# Токен для Prometheus (Authorization: Bearer <token>); без него /metrics выключен
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await warm_up_mongo()
+        await warm_up_redis()
+    except Exception as e:
+        # Пулы дозаполнятся по первым запросам
+        logger.warning("Connection warm-up failed: %s", e)
+    await ensure_indexes()
+    if os.getenv("INDEX_EXPLAIN", "False").lower() in ("true", "1"):
+        for query_name, indexes in (await explain_router_queries()).items():
+            logger.info("Query %s uses %s", query_name, ", ".join(indexes))
+    start_login_listener()
+    start_report_events_listener()
+    start_archiver()
+    yield
+    await stop_archiver()
+    await stop_report_events_listener()
+    await stop_login_listener()
+    await stop_enrichment()
+    await close_tracker()
+    await close_redis()
+    close_mongo()
+
+
+app = FastAPI(lifespan=lifespan)
 
 cors_origins = os.getenv("CORS_ORIGINS", "")
 origins = [
@@ -24,11 +70,61 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["ETag"]
+)
+
+
+app.add_middleware(MetricsMiddleware)
+
+Gauge(
+    "websocket_sessions", "Open WebSocket sessions on this worker", ("endpoint",),
+    callback=lambda: {("login",): len(active_connections), ("reports",): len(subscribers)},
 )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: str = Header("")):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/live", include_in_schema=False)
+async def liveness():
+    return {"status": "ok"}
+
+
+async def _check(ping) -> str:
+    try:
+        await asyncio.wait_for(ping(), timeout=READINESS_TIMEOUT)
+        return "ok"
+    except Exception as e:
+        return f"error: {type(e).__name__}"
+
+
+@app.get("/health/ready", include_in_schema=False)
+async def readiness():
+    """
+    Воркер готов принимать трафик, только если Mongo и Redis отвечают.
+    Эндпоинт начинает отвечать после lifespan, т.е. после прогрева пулов.
+    """
+    mongo, redis_status = await asyncio.gather(
+        _check(lambda: client.admin.command("ping")),
+        _check(redis.ping),
+    )
+    checks = {"mongo": mongo, "redis": redis_status}
+    ready = all(status == "ok" for status in checks.values())
+    return JSONResponse(
+        {"status": "ready" if ready else "unavailable", "checks": checks},
+        status_code=200 if ready else 503,
+    )
+
+
 app.include_router(service, prefix="/service")
 app.include_router(sockets, prefix="/ws")
 app.include_router(task, prefix="/tasks")
-app.include_router(users, prefix="/users")
\ No newline at end of file
+app.include_router(users, prefix="/users")
+app.include_router(analytics, prefix="/analytics")
\ No newline at end of file
@@ -1,4 +1,5 @@
 from .service import router as service
 from .sockets import router as sockets
 from .tasks import router as task
-from .users import router as users
\ No newline at end of file
+from .users import router as users
+from .analytics import router as analytics
\ No newline at end of file
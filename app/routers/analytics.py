@@ -0,0 +1,241 @@
+import os
+import json
+import hashlib
+import logging
+
+from fastapi import APIRouter, Query, HTTPException, Depends
+from typing import Optional
+from datetime import datetime, time, timedelta
+from bson import ObjectId
+from redis.exceptions import RedisError
+
+from app.database import collection, redis
+from app.auth import get_user_from_jwt
+from app.utils.serialization import DefaultJSONResponse
+from app.utils.metrics import cache_requests
+from app.utils.dates import date_to_condition
+from app.utils.feed_cache import get_feed_generation
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(default_response_class=DefaultJSONResponse)
+
+# 0 — кэширование агрегатов в Redis выключено
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", 300))
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", 28))
+
+
+def analytics_filters(
+    date_from: Optional[datetime] = Query(None, description="Начало периода (по умолчанию — ANALYTICS_DEFAULT_DAYS дней назад)"),
+    date_to: Optional[datetime] = Query(None, description="Конец периода включительно; YYYY-MM-DD — весь день (по умолчанию — сегодня)"),
+    owner_id: Optional[str] = Query(None, description="ID пользователя для фильтрации"),
+) -> dict:
+    # По умолчанию — сегодняшний день целиком: значение не меняется в течение
+    # дня, поэтому запросы без дат попадают в один ключ кэша
+    date_to = date_to or datetime.combine(datetime.utcnow().date(), time.min)
+    date_from = date_from or date_to - timedelta(days=ANALYTICS_DEFAULT_DAYS)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must be before date_to")
+    if owner_id:
+        try:
+            ObjectId(owner_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid owner_id format")
+    return {"date_from": date_from, "date_to": date_to, "owner_id": owner_id}
+
+
+def _match_stage(filters: dict) -> dict:
+    match = {
+        "is_deleted": {"$ne": True},
+        "date": {"$gte": filters["date_from"], **date_to_condition(filters["date_to"])},
+    }
+    if filters["owner_id"]:
+        match["user_id"] = ObjectId(filters["owner_id"])
+    return {"$match": match}
+
+
+def _day(field: str) -> dict:
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": field}}
+
+
+async def _cached(name: str, filters: dict, build):
+    """Отдаёт готовый ответ из Redis по набору фильтров или считает его через build()."""
+    if ANALYTICS_CACHE_TTL <= 0:
+        return await build()
+
+    # Поколение ленты в ключе: любая запись отчёта делает старые агрегаты недостижимыми.
+    # Без Redis (generation = None) агрегат считается напрямую
+    generation = await get_feed_generation()
+    if generation is None:
+        return await build()
+    raw_key = json.dumps(filters, sort_keys=True, default=str)
+    key = f"analytics:{name}:{generation}:{hashlib.sha1(raw_key.encode()).hexdigest()}"
+    try:
+        cached = await redis.get(key)
+    except RedisError as e:
+        logger.warning("Analytics cache unavailable: %s", e)
+        return await build()
+    cache_requests.inc("analytics", "hit" if cached else "miss")
+    if cached:
+        return json.loads(cached)
+
+    result = await build()
+    try:
+        await redis.set(key, json.dumps(result, default=str), ex=ANALYTICS_CACHE_TTL)
+    except RedisError as e:
+        logger.warning("Failed to write analytics cache: %s", e)
+    return result
+
+
+def _period(filters: dict) -> dict:
+    return {
+        "date_from": filters["date_from"].isoformat(),
+        "date_to": filters["date_to"].isoformat(),
+        "owner_id": filters["owner_id"],
+    }
+
+
+@router.get(
+    "/blockers",
+    summary="Блокеры по разработчикам и неделям",
+    tags=["Analytics"],
+    description="""
+    Количество блокеров на пользователя за каждую ISO-неделю периода.
+
+    Ответ: `{"items": [{"user_id", "developer", "week": "YYYY-Www", "reports", "blockers"}], ...}`
+    """
+)
+async def blockers_per_week(
+    filters: dict = Depends(analytics_filters),
+    user_payload: dict = Depends(get_user_from_jwt),
+):
+    async def build():
+        pipeline = [
+            _match_stage(filters),
+            {"$sort": {"created_at": 1}},
+            {"$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "year": {"$isoWeekYear": "$date"},
+                    "week": {"$isoWeek": "$date"},
+                },
+                "developer": {"$last": "$developer"},
+                "reports": {"$sum": 1},
+                "blockers": {"$sum": {"$size": {"$ifNull": ["$blockers", []]}}},
+            }},
+            {"$sort": {"_id.year": 1, "_id.week": 1, "blockers": -1}},
+        ]
+        items = [
+            {
+                "user_id": str(row["_id"]["user_id"]),
+                "developer": row.get("developer"),
+                "week": f"{row['_id']['year']}-W{row['_id']['week']:02d}",
+                "reports": row["reports"],
+                "blockers": row["blockers"],
+            }
+            async for row in collection.aggregate(pipeline)
+        ]
+        return {**_period(filters), "items": items}
+
+    return await _cached("blockers", filters, build)
+
+
+@router.get(
+    "/task-lifetimes",
+    summary="Сколько дней задачи находятся в 'today'",
+    tags=["Analytics"],
+    description="""
+    Для каждого `task_id` — сколько разных дней задача упоминалась в блоке `today`,
+    первый и последний такой день и кто о ней отчитывался.
+
+    Ответ: `{"items": [{"task_id", "days", "first_day", "last_day", "user_ids"}], ...}`
+    """
+)
+async def task_lifetimes(
+    filters: dict = Depends(analytics_filters),
+    limit: int = Query(100, ge=1, le=1000, description="Максимум задач в ответе"),
+    user_payload: dict = Depends(get_user_from_jwt),
+):
+    async def build():
+        pipeline = [
+            _match_stage(filters),
+            {"$unwind": "$today"},
+            {"$match": {"today.task_id": {"$nin": [None, "unknown"]}}},
+            {"$group": {
+                "_id": {"task_id": "$today.task_id", "day": _day("$date")},
+                "user_ids": {"$addToSet": "$user_id"},
+            }},
+            {"$group": {
+                "_id": "$_id.task_id",
+                "days": {"$sum": 1},
+                "first_day": {"$min": "$_id.day"},
+                "last_day": {"$max": "$_id.day"},
+                "user_ids": {"$push": "$user_ids"},
+            }},
+            {"$sort": {"days": -1, "_id": 1}},
+            {"$limit": limit},
+        ]
+        items = [
+            {
+                "task_id": row["_id"],
+                "days": row["days"],
+                "first_day": row["first_day"],
+                "last_day": row["last_day"],
+                "user_ids": sorted({str(uid) for ids in row["user_ids"] for uid in ids}),
+            }
+            async for row in collection.aggregate(pipeline)
+        ]
+        return {**_period(filters), "items": items}
+
+    return await _cached("task-lifetimes", {**filters, "limit": limit}, build)
+
+
+@router.get(
+    "/compliance",
+    summary="Регулярность отправки отчётов",
+    tags=["Analytics"],
+    description="""
+    По каждому пользователю — в какие дни периода он отправлял отчёт и какую долю
+    рабочих дней (пн–пт) это составляет.
+
+    Ответ: `{"working_days", "items": [{"user_id", "developer", "days_submitted", "compliance", "days"}], ...}`
+    """
+)
+async def submission_compliance(
+    filters: dict = Depends(analytics_filters),
+    user_payload: dict = Depends(get_user_from_jwt),
+):
+    async def build():
+        pipeline = [
+            _match_stage(filters),
+            {"$sort": {"created_at": 1}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "day": _day("$date")},
+                "developer": {"$last": "$developer"},
+            }},
+            {"$sort": {"_id.day": 1}},
+            {"$group": {
+                "_id": "$_id.user_id",
+                "developer": {"$last": "$developer"},
+                "days": {"$push": "$_id.day"},
+            }},
+        ]
+        start, end = filters["date_from"].date(), filters["date_to"].date()
+        working_days = sum(
+            1 for i in range((end - start).days + 1)
+            if (start + timedelta(days=i)).weekday() < 5
+        )
+        items = []
+        async for row in collection.aggregate(pipeline):
+            submitted = len(row["days"])
+            items.append({
+                "user_id": str(row["_id"]),
+                "developer": row.get("developer"),
+                "days_submitted": submitted,
+                "compliance": round(min(submitted / working_days, 1.0), 3) if working_days else None,
+                "days": row["days"],
+            })
+        items.sort(key=lambda item: item["days_submitted"])
+        return {**_period(filters), "working_days": working_days, "items": items}
+
+    return await _cached("compliance", filters, build)
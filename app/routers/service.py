@@ -1,6 +1,5 @@
 import os
 import jwt
-import json
 import random
 import uuid
 
@@ -8,9 +7,10 @@ from datetime import datetime
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse
 
-from app.database import users_collection
-from app.routers.sockets import active_connections
-from app.auth import JWT_ALGORITHM, JWT_SECRET
+from app.database import redis, users_collection, explain_router_queries, get_or_create_user, clear_user_id_cache
+from app.routers.sockets import deliver_login_message
+from app.utils.rate_limit import check_rate_limit
+from app.auth import JWT_ALGORITHM, JWT_SECRET, get_jwt_cache_stats
 
 router = APIRouter()
 
@@ -30,23 +30,15 @@ async def confirm_code(request: Request):
     if not uuid_field or not chat_id:
         return JSONResponse({"error": "uuid and chat_id are required"}, status_code=400)
 
-    websocket = active_connections.get(uuid_field)
-    if not websocket:
+    try:
+        await check_rate_limit("confirm_code_chat", chat_id)
+    except HTTPException as e:
+        return JSONResponse({"error": str(e.detail)}, status_code=e.status_code, headers=e.headers)
+
+    if not await redis.exists(uuid_field):
         return JSONResponse({"error": "WebSocket not found or expired"}, status_code=404)
 
-    user = await users_collection.find_one({"chat_id": str(chat_id)})
-    if not user:
-        user_data = {
-            "chat_id": str(chat_id),
-            "username": username,
-            "full_name": full_name,
-            "referred_by": referred_by,
-            "created_at": datetime.utcnow()
-        }
-        insert_result = await users_collection.insert_one(user_data)
-        user_id = insert_result.inserted_id
-    else:
-        user_id = user["_id"]
+    user_id = await get_or_create_user(chat_id, username, full_name, referred_by)
 
     payload = {
         "user_id": str(user_id),
@@ -61,7 +53,8 @@ async def confirm_code(request: Request):
         "access_token": jwt_token,
     }
 
-    await websocket.send_text(json.dumps(message))
+    if not await deliver_login_message(uuid_field, message):
+        return JSONResponse({"error": "WebSocket not found or expired"}, status_code=404)
     return JSONResponse({"status": "sent", "token": jwt_token})
 
 @router.get(
@@ -89,19 +82,7 @@ async def get_test_token():
 
     chat_id_str = str(chat_id)
 
-    user = await users_collection.find_one({"chat_id": chat_id_str})
-    if not user:
-        user_data = {
-            "chat_id": chat_id_str,
-            "username": username,
-            "full_name": full_name,
-            "referred_by": referred_by,
-            "created_at": datetime.utcnow()
-        }
-        insert_result = await users_collection.insert_one(user_data)
-        user_id = insert_result.inserted_id
-    else:
-        user_id = user["_id"]
+    user_id = await get_or_create_user(chat_id_str, username, full_name, referred_by)
 
     payload = {
         "user_id": str(user_id),   # берём реальный _id из Mongo
@@ -125,6 +106,7 @@ async def delete_test_users():
     result = await users_collection.delete_many({
         "username": {"$regex": "^testuser_"}
     })
+    clear_user_id_cache()
     return JSONResponse(
         content={
             "status": "success",
@@ -132,3 +114,25 @@ async def delete_test_users():
         },
         status_code=200
     )
+
+@router.get(
+    "/indexes",
+    summary="Какие индексы используют запросы роутеров (explain)",
+    include_in_schema=False
+)
+async def get_index_usage():
+    if not os.getenv("DEBUG", "False").lower() in ("true", "1"):
+        raise HTTPException(status_code=403, detail="Not allowed in production")
+
+    return JSONResponse(content=await explain_router_queries(), status_code=200)
+
+@router.get(
+    "/cache-stats",
+    summary="Счётчики попаданий/промахов кэшей",
+    include_in_schema=False
+)
+async def get_cache_stats():
+    if not os.getenv("DEBUG", "False").lower() in ("true", "1"):
+        raise HTTPException(status_code=403, detail="Not allowed in production")
+
+    return JSONResponse(content={"jwt": get_jwt_cache_stats()}, status_code=200)
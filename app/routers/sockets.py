@@ -1,15 +1,33 @@
+import os
 import uuid
 import json
+import asyncio
+import logging
 
-from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
 
-from app.database import redis
-from app.auth import BOT_URL
+from app.database import redis, pubsub_redis
+from app.auth import BOT_URL, get_user_from_jwt
+from app.utils.report_events import subscribe, unsubscribe
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+LOGIN_SESSION_TTL = int(os.getenv("LOGIN_SESSION_TTL", 600))
+WS_HEARTBEAT_INTERVAL = int(os.getenv("WS_HEARTBEAT_INTERVAL", 25))
+# Сокет закрывается, если клиент молчит дольше этого времени. pong не
+# обязателен, поэтому по умолчанию молчащий клиент живёт всю сессию входа
+WS_IDLE_TIMEOUT = int(os.getenv("WS_IDLE_TIMEOUT", LOGIN_SESSION_TTL))
+
+# Канал этого воркера: confirm-code на любом воркере публикует сюда
+# сообщения для сокетов, которые держит текущий процесс.
+WORKER_CHANNEL = f"ws_login:{uuid.uuid4().hex}"
+
 active_connections = {}
+_listener_task = None
 
 @router.get("/login", include_in_schema=False, tags=["WebSocket"])
 def websocket_info():
@@ -21,6 +39,9 @@ def websocket_info():
     **Usage:**
     - On connect, receive `{ "uuid": "<uuid>", "bot_url": "<bot_link>" }`
     - Send JSON `{"jwt": "<your_token>"}` to save token in Redis.
+    - Server sends `{"type": "ping"}` every `WS_HEARTBEAT_INTERVAL` seconds; reply `{"type": "pong"}` is optional.
+    - The socket is closed after `WS_IDLE_TIMEOUT` seconds without client messages
+      (defaults to `LOGIN_SESSION_TTL`, so clients that never reply stay connected for the whole login session).
     - On disconnect, session UUID is removed.
 
     ⚠ This is a placeholder to display WebSocket usage in docs.
@@ -29,12 +50,75 @@ def websocket_info():
         "detail": "Use WebSocket at /ws/login — this is just a documentation helper."
     })
 
+
+async def deliver_login_message(session_uuid: str, message: dict) -> bool:
+    """
+    Отправляет сообщение сокету сессии, где бы он ни был открыт.
+    Возвращает False, если сессия истекла или её воркер не слушает канал.
+    """
+    channel = await redis.get(session_uuid)
+    if not channel:
+        return False
+    receivers = await redis.publish(channel, json.dumps({"uuid": session_uuid, "message": message}))
+    return receivers > 0
+
+
+async def _listen_worker_channel():
+    while True:
+        pubsub = pubsub_redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(WORKER_CHANNEL)
+            async for event in pubsub.listen():
+                try:
+                    data = json.loads(event["data"])
+                except (TypeError, json.JSONDecodeError):
+                    continue
+                websocket = active_connections.get(data.get("uuid"))
+                if websocket:
+                    try:
+                        await websocket.send_text(json.dumps(data.get("message")))
+                    except Exception:
+                        active_connections.pop(data.get("uuid"), None)
+        except RedisError:
+            logger.warning("Lost Redis pub/sub connection, resubscribing to %s", WORKER_CHANNEL)
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+def start_login_listener():
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen_worker_channel())
+
+
+async def stop_login_listener():
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+
+
+async def _heartbeat(websocket: WebSocket):
+    try:
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+            await websocket.send_text(json.dumps({"type": "ping"}))
+    except Exception:
+        # Отправка не прошла — сокет уже мёртв, receive_text получит disconnect
+        pass
+
+
 @router.websocket("/login")
 @router.websocket("/login/")
 async def websocket_endpoint(websocket: WebSocket, referred_by: str = Query(default=None)):
     await websocket.accept()
     session_uuid = str(uuid.uuid4())
-    await redis.set(session_uuid, "connected", ex=600)
+    await redis.set(session_uuid, WORKER_CHANNEL, ex=LOGIN_SESSION_TTL)
 
     bot_url = f"{BOT_URL}?start=uuid_{session_uuid}"
     if referred_by:
@@ -46,22 +130,75 @@ async def websocket_endpoint(websocket: WebSocket, referred_by: str = Query(defa
     }))
 
     active_connections[session_uuid] = websocket
+    heartbeat = asyncio.create_task(_heartbeat(websocket))
 
     try:
         while True:
-            message = await websocket.receive_text()
+            message = await asyncio.wait_for(websocket.receive_text(), timeout=WS_IDLE_TIMEOUT)
+            await redis.expire(session_uuid, LOGIN_SESSION_TTL)
             try:
                 data = json.loads(message)
             except json.JSONDecodeError:
                 await websocket.send_text(json.dumps({"error": "Invalid JSON"}))
                 continue
 
+            if data.get("type") == "pong":
+                continue
+
             jwt_payload = data.get("jwt")
             if jwt_payload:
-                await redis.set(f"jwt:{session_uuid}", jwt_payload, ex=600)
+                await redis.set(f"jwt:{session_uuid}", jwt_payload, ex=LOGIN_SESSION_TTL)
                 await websocket.send_text(json.dumps({"status": "jwt_saved"}))
             else:
                 await websocket.send_text(json.dumps({"error": "JWT not found"}))
+    except asyncio.TimeoutError:
+        await websocket.close(code=1000, reason="Idle timeout")
     except WebSocketDisconnect:
+        pass
+    finally:
+        heartbeat.cancel()
         await redis.delete(session_uuid)
         active_connections.pop(session_uuid, None)
+
+
+@router.websocket("/reports")
+async def reports_feed(websocket: WebSocket, token: str = Query(...)):
+    """
+    Поток изменений отчётов: `{"event": "created" | "updated" | "deleted", "report": {...}}`.
+    JWT передаётся query-параметром `token`. Клиент, который не успевает
+    читать события, отключается с кодом 1013 и должен перечитать ленту.
+    """
+    try:
+        await get_user_from_jwt(f"Bearer {token}")
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+
+    await websocket.accept()
+    queue = subscribe()
+
+    async def send_events():
+        while True:
+            message = await queue.get()
+            if message is None:
+                await websocket.close(code=1013, reason="Client is too slow")
+                return
+            await websocket.send_text(message)
+
+    async def receive_messages():
+        # Входящие сообщения (pong) не нужны, но receive нужен, чтобы заметить disconnect
+        while True:
+            await websocket.receive_text()
+
+    tasks = [
+        asyncio.create_task(send_events()),
+        asyncio.create_task(receive_messages()),
+        asyncio.create_task(_heartbeat(websocket)),
+    ]
+    try:
+        # Любая завершившаяся задача (disconnect, медленный клиент, неудачный ping) закрывает сессию
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        unsubscribe(queue)
+        for task in tasks:
+            task.cancel()
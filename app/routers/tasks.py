@@ -1,15 +1,119 @@
-from fastapi import APIRouter, Query, HTTPException, Depends, status, Path
-from typing import Optional, List, Literal
-from datetime import date, datetime
+import os
+import io
+import re
+import heapq
+import csv
+import json
+
+from fastapi import APIRouter, Query, HTTPException, Depends, status, Path, Header, Response, Body
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Literal, Dict, Any
+from datetime import date, datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from pydantic import ValidationError
 
-from app.schemas import TaskSuccessResponse, ReportOut, ReportUpdate
-from app.database import collection
+from app.schemas import TaskSuccessResponse, TaskBatchItem, ReportOut, ReportUpdate
+from app.database import collection, archive_collection, change_stamp, next_change_seq, server_time, settled_before, record_reports_created, record_report_updated, refresh_user_report_stats
 from app.auth import get_user_from_jwt
-from app.utils.enrich_task import enrich_task
+from app.utils.rate_limit import limit_by_user
+from app.utils.enrich_task import enrich_task, enrich_inline, enrich_inline_many, schedule_enrichment
+from app.utils.dates import date_to_condition
+from app.utils.pagination import encode_cursor, decode_cursor, keyset_filter
+from app.utils.report_events import publish_report_event
+from app.utils.serialization import FAST_JSON, DefaultJSONResponse, dumps, json_response
+from app.utils.feed_cache import bump_feed_generation, feed_cache_key, get_cached_feed, set_cached_feed
+
+
+router = APIRouter(default_response_class=DefaultJSONResponse)
+
+REPORTS_PAGE_DEFAULT = int(os.getenv("REPORTS_PAGE_DEFAULT", 50))
+REPORTS_PAGE_MAX = int(os.getenv("REPORTS_PAGE_MAX", 200))
+CHANGES_PAGE_MAX = int(os.getenv("CHANGES_PAGE_MAX", 500))
+SEARCH_PAGE_DEFAULT = int(os.getenv("SEARCH_PAGE_DEFAULT", 20))
+SEARCH_QUERY_MAX = 200
+# Подсветка совпадений приближает стемминг text-индекса сравнением префиксов:
+# слова совпадают, если равны их первые SEARCH_STEM_PREFIX символов (или
+# более короткое слово целиком, но не короче SEARCH_STEM_MIN символов)
+SEARCH_STEM_PREFIX = int(os.getenv("SEARCH_STEM_PREFIX", 5))
+SEARCH_STEM_MIN = 3
+SUBMIT_BATCH_MAX = int(os.getenv("SUBMIT_BATCH_MAX", 100))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+TASK_BUCKETS = ("yesterday", "today", "blockers")
+REPORT_OUT_PROJECTION = {field.alias or name: 1 for name, field in ReportOut.model_fields.items()}
+REPORT_FIELDS = {"user_id", "date", "developer", "yesterday", "today", "blockers", "created_at", "updated_at", "version"}
+
+
+def reports_query(
+    date: Optional[datetime] = Query(None, description="Дата отчёта в формате YYYY-MM-DD"),
+    date_from: Optional[datetime] = Query(None, description="Начало диапазона дат отчёта (включительно)"),
+    date_to: Optional[datetime] = Query(None, description="Конец диапазона дат отчёта (включительно; YYYY-MM-DD — весь день)"),
+    owner_id: Optional[str] = Query(None, description="ID пользователя для фильтрации отчётов"),
+) -> dict:
+    """Общие фильтры списка отчётов (зависимость для get_reports и export_reports)."""
+    query = {"is_deleted": {"$ne": True}}
+
+    if owner_id:
+        try:
+            query["user_id"] = ObjectId(owner_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid owner_id format")
+
+    date_range = {}
+    if date:
+        day_start = datetime.combine(date.date(), datetime.min.time())
+        date_range = {"$gte": day_start, "$lt": day_start + timedelta(days=1)}
+    else:
+        if date_from:
+            date_range["$gte"] = date_from
+        if date_to:
+            date_range.update(date_to_condition(date_to))
+    if date_range:
+        query["date"] = date_range
 
+    return query
+
+
+def serialize_report(report: dict) -> dict:
+    report["_id"] = str(report["_id"])
+    if "user_id" in report:
+        report["user_id"] = str(report["user_id"])
+    for key in ("date", "created_at", "updated_at", "deleted_at", "changed_at"):
+        if isinstance(report.get(key), datetime):
+            report[key] = report[key].isoformat()
+    return report
+
+
+def build_report_document(data: TaskSuccessResponse, user_id: str) -> dict:
+    return {
+        "user_id": ObjectId(user_id),
+        "date": data.date,
+        "developer": data.developer,
+        "yesterday": [enrich_task(task) for task in data.yesterday],
+        "today": [enrich_task(task) for task in data.today],
+        "blockers": [enrich_task(task) for task in data.blockers],
+        "created_at": datetime.utcnow(),
+        "version": 1,
+    }
+
+
+def report_etag(report: dict) -> str:
+    return f'"{report.get("version", 0)}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Версия из заголовка If-Match; None — проверка не нужна."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
 
-router = APIRouter()
 
 @router.post(
     "/submit",
@@ -18,66 +122,530 @@ router = APIRouter()
     summary="Отправка ежедневного отчета",
     response_model=dict,
     tags=["Reports"],
+    dependencies=[Depends(limit_by_user("submit_user"))],
 )
 async def submit(data: TaskSuccessResponse, user_payload: dict = Depends(get_user_from_jwt)):
     user_id = user_payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="User ID not found in token")
     
-    enriched_data = {
-        "user_id": ObjectId(user_id),
-        "date": data.date.isoformat(),
-        "developer": data.developer,
-        "yesterday": [enrich_task(task) for task in data.yesterday],
-        "today": [enrich_task(task) for task in data.today],
-        "blockers": [enrich_task(task) for task in data.blockers],
-        "created_at": datetime.utcnow().isoformat()
-    }
+    enriched_data = build_report_document(data, user_id)
+    await enrich_inline(enriched_data)
+    enriched_data.update(await change_stamp())
     result = await collection.insert_one(enriched_data)
+    await record_reports_created(user_id, [enriched_data])
+    await bump_feed_generation()
+    await publish_report_event("created", enriched_data)
+    schedule_enrichment([enriched_data])
     return {"inserted_id": str(result.inserted_id)}
 
+
+@router.post(
+    "/submit/batch",
+    status_code=status.HTTP_200_OK,
+    summary="Пакетная отправка отчетов",
+    response_model=dict,
+    tags=["Reports"],
+    dependencies=[Depends(limit_by_user("submit_user"))],
+    description="""
+    Принимает список отчётов (до `SUBMIT_BATCH_MAX`) в формате `/tasks/submit` и сохраняет их одним `insert_many`.
+    Невалидные элементы не мешают остальным.
+
+    - **idempotency_key** (опционально, в каждом элементе): повторная отправка с тем же ключом
+      не создаёт дубликат, а возвращает ID уже сохранённого отчёта в `duplicates`
+
+    Ответ: `{"inserted": [{"index", "inserted_id"}], "duplicates": [{"index", "inserted_id"}], "errors": [{"index", "detail"}]}`
+    """
+)
+async def submit_batch(
+    items: List[Dict[str, Any]] = Body(..., description="Список отчётов"),
+    user_payload: dict = Depends(get_user_from_jwt)
+):
+    user_id = user_payload.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="User ID not found in token")
+    if len(items) > SUBMIT_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {SUBMIT_BATCH_MAX} reports")
+
+    errors = []
+    documents = []
+    indexes = []
+    # Индексы элементов с уже встречавшимся ключом: {idempotency_key: [index, ...]}
+    duplicate_keys = {}
+    batch_keys = set()
+    for index, item in enumerate(items):
+        try:
+            data = TaskBatchItem.model_validate(item)
+        except ValidationError as e:
+            errors.append({"index": index, "detail": e.errors(include_url=False, include_context=False)})
+            continue
+        key = data.idempotency_key
+        if key and key in batch_keys:
+            duplicate_keys.setdefault(key, []).append(index)
+            continue
+        document = build_report_document(data, user_id)
+        if key:
+            batch_keys.add(key)
+            document["idempotency_key"] = key
+        documents.append(document)
+        indexes.append(index)
+
+    await enrich_inline_many(documents)
+
+    failed = {}
+    if documents:
+        first_seq, changed_at = await next_change_seq(len(documents))
+        for offset, document in enumerate(documents):
+            document["change_seq"] = first_seq + offset
+            document["changed_at"] = changed_at
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err for err in e.details.get("writeErrors", [])}
+
+    inserted = []
+    key_to_id = {}
+    for position, (index, document) in enumerate(zip(indexes, documents)):
+        err = failed.get(position)
+        key = document.get("idempotency_key")
+        if err is None:
+            inserted.append({"index": index, "inserted_id": str(document["_id"])})
+            if key:
+                key_to_id[key] = str(document["_id"])
+        elif err.get("code") == 11000 and key:
+            duplicate_keys.setdefault(key, []).append(index)
+        else:
+            errors.append({"index": index, "detail": err.get("errmsg", "Write failed")})
+
+    if inserted:
+        created = [document for position, document in enumerate(documents) if position not in failed]
+        await record_reports_created(user_id, created)
+        await bump_feed_generation()
+        for document in created:
+            await publish_report_event("created", document)
+        schedule_enrichment(created)
+
+    missing_keys = [key for key in duplicate_keys if key not in key_to_id]
+    if missing_keys:
+        existing = collection.find(
+            {"user_id": ObjectId(user_id), "idempotency_key": {"$in": missing_keys}},
+            {"idempotency_key": 1},
+        )
+        async for report in existing:
+            key_to_id[report["idempotency_key"]] = str(report["_id"])
+
+    duplicates = [
+        {"index": index, "inserted_id": key_to_id.get(key)}
+        for key, key_indexes in duplicate_keys.items()
+        for index in key_indexes
+    ]
+
+    return {
+        "inserted": inserted,
+        "duplicates": sorted(duplicates, key=lambda d: d["index"]),
+        "errors": sorted(errors, key=lambda d: d["index"]),
+    }
+
 @router.get(
     "/reports",
     response_model=None,
     summary="Получение отчетов",
     tags=["Reports"],
     description="""
-    Возвращает список всех отчётов, либо только отчёты указанного пользователя, если задан `owner_id`.
+    Возвращает страницу отчётов всех пользователей, либо только отчёты указанного пользователя, если задан `owner_id`.
 
-    - **date** (опционально): дата отчета `YYYY-MM-DD`
+    - **date** (опционально): дата отчета `YYYY-MM-DD` (весь день)
+    - **date_from** / **date_to** (опционально): диапазон дат отчёта, границы включительно (игнорируется, если задан `date`)
     - **owner_id** (опционально): ID пользователя (для фильтрации)
     - **sort_order** (опционально): порядок сортировки по дате создания ("desc" — сначала новые [по умолчанию], "asc" — сначала старые)
+    - **limit** (опционально): размер страницы (не больше `REPORTS_PAGE_MAX`)
+    - **cursor** (опционально): значение `next_cursor` из предыдущего ответа
+    - **fields** (опционально): список полей через запятую, например `date,developer`
+    - **include_archived** (опционально): добавить неудалённые отчёты, перенесённые в архив по `ARCHIVE_HORIZON_DAYS`
+      (удалённые отчёты из архива не возвращаются; при `ARCHIVE_HORIZON_DAYS=0` параметр ничего не добавляет)
+
+    Ответ: `{"items": [...], "next_cursor": "<cursor>" | null}`
+
+    Страницы кэшируются в Redis и сбрасываются при любом изменении отчётов.
+    Если Redis недоступен, страница читается из Mongo без `ETag`. Иначе ответ содержит `ETag`; с заголовком `If-None-Match` неизменившаяся страница вернёт 304.
     """
 )
 async def get_reports(
-    date: Optional[datetime] = Query(None, description="Дата отчёта в формате YYYY-MM-DD"),
-    owner_id: Optional[str] = Query(None, description="ID пользователя для фильтрации отчётов"),
+    query: dict = Depends(reports_query),
     sort_order: Literal["asc", "desc"] = Query("desc", description="Порядок сортировки по дате: 'asc' или 'desc'"),
+    limit: int = Query(REPORTS_PAGE_DEFAULT, ge=1, description="Количество отчётов на странице"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor)"),
+    fields: Optional[str] = Query(None, description="Поля отчёта через запятую"),
+    include_archived: bool = Query(False, description="Включить неудалённые отчёты из архива"),
+    if_none_match: Optional[str] = Header(None, description="ETag ранее полученной страницы"),
     user_payload: dict = Depends(get_user_from_jwt)
 ):
-    query = {"is_deleted": {"$ne": True}}
+    projection = None
+    if fields:
+        requested = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = requested - REPORT_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        projection = {f: 1 for f in requested | {"created_at"}}
+
+    limit = min(limit, REPORTS_PAGE_MAX)
+    cache_key, etag = await feed_cache_key({
+        "query": query,
+        "sort": sort_order,
+        "limit": limit,
+        "cursor": cursor,
+        "fields": sorted(projection) if projection else None,
+        "include_archived": include_archived,
+    })
+    if etag and if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    # Без Redis (cache_key = None) страница читается из Mongo без ETag и без записи в кэш
+    body = await get_cached_feed(cache_key)
+    if body is None:
+        page = await _load_reports_page(query, projection, sort_order, limit, cursor, include_archived)
+        if FAST_JSON:
+            body = dumps(page)
+        else:
+            page["items"] = [serialize_report(report) for report in page["items"]]
+            body = json.dumps(page, ensure_ascii=False)
+        await set_cached_feed(cache_key, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag} if etag else None)
+
+
+async def _load_reports_page(
+    query: dict, projection: Optional[dict], sort_order: str, limit: int, cursor: Optional[str], include_archived: bool = False
+) -> dict:
+    sort_direction = -1 if sort_order == "desc" else 1
+    if cursor:
+        query.update(keyset_filter(*decode_cursor(cursor), sort_direction))
+
+    sort = [("created_at", sort_direction), ("_id", sort_direction)]
+    reports = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+    if include_archived:
+        # Обе выборки уже отсортированы по (created_at, _id): сливаем и берём
+        # limit + 1, поэтому один курсор продолжает обе коллекции
+        archived = await archive_collection.find(query, projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+        merged = heapq.merge(
+            reports, archived,
+            key=lambda report: (report.get("created_at"), report["_id"]),
+            reverse=sort_direction < 0,
+        )
+        # Отчёт, скопированный в архив, но ещё не удалённый из рабочей коллекции, встречается дважды
+        seen = set()
+        reports = [r for r in merged if r["_id"] not in seen and not seen.add(r["_id"])][:limit + 1]
+
+    next_cursor = None
+    if len(reports) > limit:
+        reports = reports[:limit]
+        last = reports[-1]
+        next_cursor = encode_cursor(last.get("created_at"), last["_id"])
+
+    return {"items": reports, "next_cursor": next_cursor}
+
+
+@router.get(
+    "/reports/export",
+    response_model=None,
+    summary="Потоковая выгрузка отчетов",
+    tags=["Reports"],
+    description="""
+    Выгружает все отчёты, подходящие под фильтры `GET /tasks/reports` (`date`, `date_from`, `date_to`, `owner_id`),
+    без пагинации. Строки отдаются по мере чтения курсора Mongo, поэтому объём выгрузки не ограничен памятью.
+
+    - **format**: `ndjson` — один отчёт JSON на строку, `csv` — одна строка на задачу отчёта
+      (`report_id, user_id, date, developer, bucket, task_id, url, description`)
+    """
+)
+async def export_reports(
+    query: dict = Depends(reports_query),
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Формат выгрузки: 'ndjson' или 'csv'"),
+    sort_order: Literal["asc", "desc"] = Query("asc", description="Порядок сортировки по дате: 'asc' или 'desc'"),
+    user_payload: dict = Depends(get_user_from_jwt)
+):
+    sort_direction = -1 if sort_order == "desc" else 1
+    cursor_db = collection.find(query).sort(
+        [("created_at", sort_direction), ("_id", sort_direction)]
+    ).batch_size(EXPORT_BATCH_SIZE)
+
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(cursor_db),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="reports.csv"'},
+        )
+    return StreamingResponse(_export_ndjson(cursor_db), media_type="application/x-ndjson")
+
+
+async def _export_ndjson(cursor_db):
+    async for report in cursor_db:
+        if FAST_JSON:
+            yield dumps(report) + b"\n"
+        else:
+            yield json.dumps(serialize_report(report), ensure_ascii=False) + "\n"
+
+
+async def _export_csv(cursor_db):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
 
+    writer.writerow(["report_id", "user_id", "date", "developer", "bucket", "task_id", "url", "description"])
+    yield flush()
+    async for report in cursor_db:
+        report = serialize_report(report)
+        head = [report["_id"], report.get("user_id", ""), report.get("date", ""), report.get("developer", "")]
+        for bucket in ("yesterday", "today", "blockers"):
+            for task in report.get(bucket) or []:
+                writer.writerow(head + [bucket, task.get("task_id", ""), task.get("url", ""), task.get("description", "")])
+        yield flush()
+
+@router.get(
+    "/reports/changes",
+    response_model=None,
+    summary="Изменения отчётов с момента синхронизации",
+    tags=["Reports"],
+    description="""
+    Дельта-синхронизация ленты: возвращает отчёты, созданные, изменённые или удалённые после токена `since`,
+    в порядке номера изменения. Клиент хранит локальную копию и применяет изменения по `_id`.
+
+    - **since** (опционально): `next_token` из предыдущего ответа; без него лента отдаётся с начала
+    - **owner_id** (опционально): только изменения отчётов указанного пользователя
+    - **limit** (опционально): размер страницы (не больше `CHANGES_PAGE_MAX`)
+
+    Удалённые отчёты приходят как `{"_id", "is_deleted": true, "deleted_at", "change_seq"}`.
+    Изменения сразу после пропуска в номерах придерживаются до `CHANGES_SETTLE_MS`, пока пропуск
+    может оказаться ещё не видимой записью (с `owner_id` пропуски встречаются чаще).
+    Если `has_more` = true, следующую страницу нужно запросить сразу с новым токеном.
+
+    Ответ: `{"items": [...], "next_token": "<token>", "has_more": bool}`
+    """
+)
+async def get_report_changes(
+    since: Optional[str] = Query(None, description="Токен предыдущей синхронизации (next_token)"),
+    owner_id: Optional[str] = Query(None, description="ID пользователя для фильтрации отчётов"),
+    limit: int = Query(REPORTS_PAGE_MAX, ge=1, description="Количество изменений на странице"),
+    user_payload: dict = Depends(get_user_from_jwt)
+):
+    try:
+        since_seq = int(since) if since else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since token")
+
+    query = {"change_seq": {"$gt": since_seq}}
     if owner_id:
         try:
             query["user_id"] = ObjectId(owner_id)
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid owner_id format")
 
-    if date:
-        query["date"] = date.isoformat()
+    limit = min(limit, CHANGES_PAGE_MAX)
+    changes = await collection.find(query).sort("change_seq", 1).limit(limit + 1).to_list(length=limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Отдаём изменения до первого "свежего" пропуска в номерах: меньший номер,
+    # выданный параллельной записи, ещё может появиться, и токен не должен
+    # его перепрыгнуть (см. CHANGES_SETTLE_MS)
+    expected_seq = since_seq + 1
+    horizon = None
+    for position, report in enumerate(changes):
+        if report["change_seq"] != expected_seq:
+            if horizon is None:
+                horizon = settled_before(await server_time())
+            if report.get("changed_at") and report["changed_at"] > horizon:
+                changes, has_more = changes[:position], False
+                break
+        expected_seq = report["change_seq"] + 1
+
+    items = []
+    for report in changes:
+        if report.get("is_deleted"):
+            report = {key: report.get(key) for key in ("_id", "is_deleted", "deleted_at", "change_seq")}
+        items.append(report)
+
+    next_token = str(changes[-1]["change_seq"]) if changes else str(since_seq)
+    return json_response({"items": items, "next_token": next_token, "has_more": has_more})
+
+
+def search_terms(q: str) -> list:
+    """Слова запроса без исключённых (-слово) — для подсветки совпавших задач."""
+    return [
+        term.lower()
+        for negated, term in re.findall(r'(-?)(\w+)', q)
+        if not negated
+    ]
+
+
+def term_matches(term: str, text) -> bool:
+    """Есть ли в text слово, совпадающее с term с точностью до окончания."""
+    for word in re.findall(r'\w+', str(text or "").lower()):
+        if word == term:
+            return True
+        size = min(SEARCH_STEM_PREFIX, len(term), len(word))
+        if size >= SEARCH_STEM_MIN and word[:size] == term[:size]:
+            return True
+    return False
+
+
+@router.get(
+    "/search",
+    response_model=None,
+    summary="Полнотекстовый поиск по отчётам",
+    tags=["Reports"],
+    description="""
+    Ищет отчёты по описаниям задач (`yesterday` / `today` / `blockers`), ID задач трекера и имени разработчика.
+    Работает через текстовый индекс Mongo: поддерживаются фразы в кавычках (`"payment migration"`)
+    и исключения (`-refactoring`). Результаты отсортированы по релевантности.
+
+    - **q**: поисковый запрос
+    - **owner_id** (опционально): искать только в отчётах указанного пользователя
+    - **limit**, **cursor** — как в `GET /tasks/reports`
+
+    Ответ: `{"items": [{"report_id", "user_id", "developer", "date", "created_at", "score",
+    "matches": [{"bucket", "task_id", "url", "description"}]}], "next_cursor"}`.
+    Если запрос совпал с именем разработчика, в `matches` есть элемент
+    `{"bucket": "developer", "task_id": null, "url": null, "description": "<developer>"}`.
+    """
+)
+async def search_reports(
+    q: str = Query(..., min_length=1, max_length=SEARCH_QUERY_MAX, description="Поисковый запрос"),
+    owner_id: Optional[str] = Query(None, description="ID пользователя для фильтрации отчётов"),
+    limit: int = Query(SEARCH_PAGE_DEFAULT, ge=1, description="Количество отчётов на странице"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor)"),
+    user_payload: dict = Depends(get_user_from_jwt)
+):
+    match = {"$text": {"$search": q}, "is_deleted": {"$ne": True}}
+    if owner_id:
+        try:
+            match["user_id"] = ObjectId(owner_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid owner_id format")
+
+    limit = min(limit, REPORTS_PAGE_MAX)
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "user_id": 1, "developer": 1, "date": 1, "created_at": 1,
+            **{bucket: 1 for bucket in TASK_BUCKETS},
+            "score": {"$meta": "textScore"},
+        }},
+    ]
+    if cursor:
+        # Keyset по (score, _id): курсор хранит позицию последнего отданного отчёта
+        score, last_id = decode_cursor(cursor)
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": score}},
+            {"score": score, "_id": {"$lt": last_id}},
+        ]}})
+    pipeline += [{"$sort": {"score": -1, "_id": -1}}, {"$limit": limit + 1}]
+
+    reports = await collection.aggregate(pipeline).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(reports) > limit:
+        reports = reports[:limit]
+        next_cursor = encode_cursor(reports[-1]["score"], reports[-1]["_id"])
 
+    terms = search_terms(q)
+    items = []
+    for report in reports:
+        matches = [
+            {
+                "bucket": bucket,
+                "task_id": task.get("task_id"),
+                "url": task.get("url"),
+                "description": task.get("description"),
+            }
+            for bucket in TASK_BUCKETS
+            for task in report.get(bucket) or []
+            if any(
+                term_matches(term, task.get("description")) or term_matches(term, task.get("task_id"))
+                for term in terms
+            )
+        ]
+        if any(term_matches(term, report.get("developer")) for term in terms):
+            matches.append({"bucket": "developer", "task_id": None, "url": None, "description": report.get("developer")})
+        report = serialize_report(report)
+        items.append({
+            "report_id": report["_id"],
+            "user_id": report.get("user_id"),
+            "developer": report.get("developer"),
+            "date": report.get("date"),
+            "created_at": report.get("created_at"),
+            "score": round(report["score"], 4),
+            "matches": matches,
+        })
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get(
+    "/by-task/{task_id}",
+    response_model=None,
+    summary="История задачи трекера по отчётам",
+    tags=["Reports"],
+    description="""
+    Возвращает отчёты, в которых упоминается задача `task_id` (ID из ссылки трекера),
+    с указанием разработчика, дня и блоков (`yesterday` / `today` / `blockers`), где она встретилась.
+
+    - **sort_order**, **limit**, **cursor** — как в `GET /tasks/reports`
+
+    Ответ: `{"items": [{"report_id", "user_id", "developer", "date", "created_at", "mentions": [{"bucket", "url", "description"}]}], "next_cursor"}`
+    """
+)
+async def get_task_timeline(
+    task_id: str = Path(..., description="ID задачи в трекере"),
+    sort_order: Literal["asc", "desc"] = Query("desc", description="Порядок сортировки по дате: 'asc' или 'desc'"),
+    limit: int = Query(REPORTS_PAGE_DEFAULT, ge=1, description="Количество отчётов на странице"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor)"),
+    user_payload: dict = Depends(get_user_from_jwt)
+):
+    conditions = [
+        {"is_deleted": {"$ne": True}},
+        {"$or": [{f"{bucket}.task_id": task_id} for bucket in TASK_BUCKETS]},
+    ]
     sort_direction = -1 if sort_order == "desc" else 1
-    cursor = collection.find(query).sort("created_at", sort_direction)
-    reports = await cursor.to_list(length=None)
+    if cursor:
+        conditions.append(keyset_filter(*decode_cursor(cursor), sort_direction))
+
+    limit = min(limit, REPORTS_PAGE_MAX)
+    projection = {"user_id": 1, "developer": 1, "date": 1, "created_at": 1, **{bucket: 1 for bucket in TASK_BUCKETS}}
+    cursor_db = collection.find({"$and": conditions}, projection).sort(
+        [("created_at", sort_direction), ("_id", sort_direction)]
+    ).limit(limit + 1)
+    reports = await cursor_db.to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(reports) > limit:
+        reports = reports[:limit]
+        next_cursor = encode_cursor(reports[-1].get("created_at"), reports[-1]["_id"])
 
+    items = []
     for report in reports:
-        report["_id"] = str(report["_id"])
-        if "user_id" in report:
-            report["user_id"] = str(report["user_id"])
-        if "created_at" in report and hasattr(report["created_at"], "isoformat"):
-            report["created_at"] = report["created_at"].isoformat()
+        mentions = [
+            {"bucket": bucket, "url": task.get("url"), "description": task.get("description")}
+            for bucket in TASK_BUCKETS
+            for task in report.get(bucket) or []
+            if task.get("task_id") == task_id
+        ]
+        report = serialize_report(report)
+        items.append({
+            "report_id": report["_id"],
+            "user_id": report.get("user_id"),
+            "developer": report.get("developer"),
+            "date": report.get("date"),
+            "created_at": report.get("created_at"),
+            "mentions": mentions,
+        })
+
+    return {"items": items, "next_cursor": next_cursor}
 
-    return reports
 
 @router.get(
     "/reports/{report_id}",
@@ -86,7 +654,9 @@ async def get_reports(
     tags=["Reports"],
 )
 async def get_report(
+    response: Response,
     report_id: str = Path(..., description="ID отчёта"),
+    include_archived: bool = Query(False, description="Искать отчёт и в архиве"),
     user_payload: dict = Depends(get_user_from_jwt),
 ):
     try:
@@ -98,16 +668,24 @@ async def get_report(
     if not user_id:
         raise HTTPException(status_code=401, detail="User ID not found in token")
 
-    report = await collection.find_one({"_id": oid, "user_id": ObjectId(user_id), "is_deleted": {"$ne": True}})
-    
+    report_filter = {"_id": oid, "user_id": ObjectId(user_id), "is_deleted": {"$ne": True}}
+    report = await collection.find_one(report_filter, REPORT_OUT_PROJECTION)
+    if not report and include_archived:
+        report = await archive_collection.find_one(report_filter, REPORT_OUT_PROJECTION)
+
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
 
+    if FAST_JSON:
+        # Без валидации через ReportOut: проекция уже совпадает с его полями
+        return json_response(report, headers={"ETag": report_etag(report)})
+
     report["_id"] = str(report["_id"])
     report["user_id"] = str(report["user_id"])
     if isinstance(report.get("created_at"), datetime):
         report["created_at"] = report["created_at"]
 
+    response.headers["ETag"] = report_etag(report)
     return report
 
 
@@ -116,10 +694,18 @@ async def get_report(
     response_model=ReportOut,
     summary="Частичное обновление отчёта",
     tags=["Reports"],
+    description="""
+    Обновляет переданные поля отчёта. Доступно только владельцу.
+
+    Для защиты от перезаписи параллельных правок передайте заголовок `If-Match`
+    со значением `ETag` из предыдущего ответа: если отчёт успел измениться, вернётся 412.
+    """
 )
 async def update_report(
+    response: Response,
     report_id: str = Path(..., description="ID отчёта"),
     data: ReportUpdate = None,
+    if_match: Optional[str] = Header(None, description="ETag отчёта, который редактируется"),
     user_payload: dict = Depends(get_user_from_jwt),
 ):
     try:
@@ -133,7 +719,7 @@ async def update_report(
 
     update_fields = {}
     if data.date is not None:
-        update_fields["date"] = data.date.isoformat()
+        update_fields["date"] = data.date
     if data.developer is not None:
         update_fields["developer"] = data.developer
     if data.yesterday is not None:
@@ -146,20 +732,43 @@ async def update_report(
     if not update_fields:
         raise HTTPException(status_code=400, detail="No fields provided for update")
 
-    update_fields["updated_at"] = datetime.utcnow().isoformat()
+    await enrich_inline(update_fields)
+    update_fields["updated_at"] = datetime.utcnow()
+    update_fields.update(await change_stamp())
 
-    result = await collection.update_one(
-        {"_id": oid, "user_id": ObjectId(user_id)},
-        {"$set": update_fields}
+    owner_filter = {"_id": oid, "user_id": ObjectId(user_id), "is_deleted": {"$ne": True}}
+    query = dict(owner_filter)
+    expected_version = parse_if_match(if_match)
+    if expected_version is not None:
+        # У отчётов, созданных до появления version, поле отсутствует (= 0)
+        query["version"] = expected_version if expected_version else {"$in": [0, None]}
+
+    report = await collection.find_one_and_update(
+        query,
+        {"$set": update_fields, "$inc": {"version": 1}},
+        projection=REPORT_OUT_PROJECTION,
+        return_document=ReturnDocument.AFTER,
     )
-    if result.matched_count == 0:
+    if report is None:
+        if expected_version is not None and await collection.count_documents(owner_filter, limit=1):
+            raise HTTPException(status_code=412, detail="Report was modified by another request")
         raise HTTPException(status_code=404, detail="Report not found or no access")
+    if "developer" in update_fields:
+        await record_report_updated(user_id, report)
+    await bump_feed_generation()
+    await publish_report_event("updated", report)
+    if any(bucket in update_fields for bucket in TASK_BUCKETS):
+        schedule_enrichment([report])
+
+    if FAST_JSON:
+        return json_response(report, headers={"ETag": report_etag(report)})
 
-    report = await collection.find_one({"_id": oid})
     report["_id"] = str(report["_id"])
     report["user_id"] = str(report["user_id"])
     if isinstance(report.get("created_at"), datetime):
         report["created_at"] = report["created_at"]
+
+    response.headers["ETag"] = report_etag(report)
     return report
 
 @router.delete(
@@ -167,7 +776,7 @@ async def update_report(
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Удаление отчёта",
     tags=["Reports"],
-    description="Удаляет отчёт по ID. Доступно только владельцу."
+    description="Удаляет отчёт по ID. Доступно только владельцу. Повторное удаление тоже возвращает 204."
 )
 async def delete_report(
     report_id: str = Path(..., description="ID отчёта"),
@@ -182,10 +791,22 @@ async def delete_report(
     if not user_id:
         raise HTTPException(status_code=401, detail="User ID not found in token")
 
+    owner_filter = {"_id": oid, "user_id": ObjectId(user_id)}
+    existing = await collection.find_one(owner_filter, {"is_deleted": 1})
+    if existing is None:
+        raise HTTPException(status_code=404, detail="Report not found or no access")
+    # Повторный DELETE ничего не меняет: иначе он сдвинул бы deleted_at (и архивацию),
+    # занял бы новый change_seq и разослал бы событие ещё раз
+    if existing.get("is_deleted"):
+        return
+
     result = await collection.update_one(
-        {"_id": oid, "user_id": ObjectId(user_id)},
-        {"$set": {"is_deleted": True, "deleted_at": datetime.utcnow().isoformat()}}
+        {**owner_filter, "is_deleted": {"$ne": True}},
+        {"$set": {"is_deleted": True, "deleted_at": datetime.utcnow(), **await change_stamp()}}
     )
-
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Report not found or no access")
+    if result.modified_count == 0:
+        return
+    # Удалённый отчёт мог быть последним: поля профиля пересчитываются целиком
+    await refresh_user_report_stats(ObjectId(user_id))
+    await bump_feed_generation()
+    await publish_report_event("deleted", {"_id": report_id, "user_id": user_id})
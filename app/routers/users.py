@@ -1,16 +1,18 @@
 import jwt
+import hashlib
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
 from fastapi.responses import JSONResponse
 
 from bson import ObjectId
 
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
 
 from app.schemas import UserShort, UserProfile, AuthResponse
-from app.database import users_collection, collection
-from app.auth import get_user_from_jwt, verify_telegram_init_data, JWT_ALGORITHM, JWT_SECRET
+from app.database import users_collection, get_or_create_user, refresh_user_report_stats, USER_PROFILE_PROJECTION
+from app.utils.rate_limit import check_rate_limit, limit_by_ip
+from app.auth import get_user_from_jwt, revoke_token, verify_telegram_init_data, mark_init_data_used, JWT_ALGORITHM, JWT_SECRET
 
 router = APIRouter()
 
@@ -35,35 +37,48 @@ async def get_all_users(user_payload: dict = Depends(get_user_from_jwt)):
     response_model=UserProfile,
     summary="Профиль текущего пользователя",
     tags=["Users"],
+    description=(
+        "Возвращает профиль из одного документа пользователя: имя последнего разработчика, "
+        "время последнего отчёта и число отчётов поддерживаются при записи отчётов.<br>"
+        "Ответ содержит <code>ETag</code>; с заголовком <code>If-None-Match</code> неизменившийся профиль вернёт 304."
+    ),
 )
-async def get_my_profile(user_payload: dict = Depends(get_user_from_jwt)):
+async def get_my_profile(
+    response: Response,
+    if_none_match: Optional[str] = Header(None, description="ETag ранее полученного профиля"),
+    user_payload: dict = Depends(get_user_from_jwt),
+):
     user_id = user_payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User ID not found in token")
 
     oid = ObjectId(user_id)
 
-    user = await users_collection.find_one({"_id": oid}, {"full_name": 1})
-    full_name = user.get("full_name", "") if user else ""
-
-    latest_report = await collection.find_one(
-        {"user_id": oid, "is_deleted": {"$ne": True}, "developer": {"$exists": True, "$ne": ""}},
-        sort=[("created_at", -1)]
-    )
-    if latest_report: developer_name = latest_report.get("developer") if latest_report.get("developer") else None
-    else: developer_name = None
+    user = await users_collection.find_one({"_id": oid}, USER_PROFILE_PROJECTION) or {}
+    if user and "reports_count" not in user:
+        # Пользователь ещё не попал в бэкфилл: считаем и сохраняем поля один раз
+        user.update(await refresh_user_report_stats(oid))
 
-    return UserProfile(
+    profile = UserProfile(
         user_id=str(oid),
-        full_name=full_name,
-        developer_name=developer_name
+        full_name=user.get("full_name", "") or "",
+        developer_name=user.get("last_developer_name") or None,
+        last_report_at=user.get("last_report_at"),
+        reports_count=user.get("reports_count", 0),
     )
 
+    etag = '"' + hashlib.sha1(profile.model_dump_json().encode()).hexdigest()[:16] + '"'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return profile
+
 @router.post(
     "/auth",
     response_model=AuthResponse,
     summary="Авторизация через Telegram Mini App",
     tags=["Auth"],
+    dependencies=[Depends(limit_by_ip("auth_ip"))],
     description=(
         "Авторизация пользователя через Telegram Mini App.<br><br>"
         "Передайте строку <code>initData</code> из Telegram WebApp.<br>"
@@ -82,6 +97,7 @@ async def get_my_profile(user_payload: dict = Depends(get_user_from_jwt)):
         "    \"exp\": \"2024-05-21T13:32:00.123456\"\n"
         "  }\n"
         "}</pre>"
+        "При превышении лимита запросов (по IP и по chat_id) возвращается 429 с заголовком <code>Retry-After</code>."
     )
 )
 async def auth_by_tma(request: Request):
@@ -103,23 +119,21 @@ async def auth_by_tma(request: Request):
         chat_id = chat_id.get("id")
     if not chat_id:
         chat_id = tg_user.get("id") or tg_user.get("user_id")
+
+    # Лимит по chat_id проверяется до отметки initData как использованного:
+    # клиент, получивший 429, может повторить запрос с тем же initData
+    try:
+        await check_rate_limit("auth_chat", chat_id)
+        await mark_init_data_used(tg_user)
+    except HTTPException as e:
+        return JSONResponse({"error": str(e.detail)}, status_code=e.status_code, headers=e.headers)
+
     username = tg_user.get("username")
     full_name = tg_user.get("first_name", "")
     if tg_user.get("last_name"):
         full_name += " " + tg_user.get("last_name")
 
-    user = await users_collection.find_one({"chat_id": str(chat_id)})
-    if not user:
-        user_data = {
-            "chat_id": str(chat_id),
-            "username": username,
-            "full_name": full_name,
-            "created_at": datetime.utcnow()
-        }
-        insert_result = await users_collection.insert_one(user_data)
-        user_id = insert_result.inserted_id
-    else:
-        user_id = user["_id"]
+    user_id = await get_or_create_user(chat_id, username, full_name)
 
     payload = {
         "user_id": str(user_id),
@@ -132,4 +146,22 @@ async def auth_by_tma(request: Request):
     
     jwt_token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-    return JSONResponse({"access_token": jwt_token, "user": payload})
\ No newline at end of file
+    return JSONResponse({"access_token": jwt_token, "user": payload})
+
+@router.post(
+    "/logout",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Выход: отзыв текущего токена",
+    tags=["Auth"],
+    description=(
+        "Отзывает JWT из заголовка <code>Authorization</code>: дальнейшие запросы с ним получают 401.<br>"
+        "Работает при <code>JWT_CACHE_SHARED=1</code> (отзыв хранится в Redis до истечения токена); "
+        "без него токен остаётся действительным до <code>exp</code>, клиенту достаточно его забыть.<br>"
+        "Если Redis недоступен, возвращается 503."
+    )
+)
+async def logout(
+    authorization: str = Header(...),
+    user_payload: dict = Depends(get_user_from_jwt),
+):
+    await revoke_token(authorization[7:], user_payload.get("exp"))
@@ -13,6 +13,9 @@ class TaskSuccessResponse(BaseModel):
     today: List[TaskInput]
     blockers: List[TaskInput]
 
+class TaskBatchItem(TaskSuccessResponse):
+    idempotency_key: Optional[str] = Field(None, max_length=128, description="Ключ повтора: отчёт с тем же ключом не будет создан дважды")
+
 class ReportUpdate(BaseModel):
     date: Optional[datetime] = None
     developer: Optional[str] = None
@@ -30,6 +33,7 @@ class ReportOut(BaseModel):
     today: List[Any]
     blockers: List[Any]
     created_at: datetime
+    version: int = 0
 
     class Config:
         allow_population_by_field_name = True
@@ -10,6 +10,8 @@ class UserProfile(BaseModel):
     user_id: str = Field(..., description="ID пользователя в базе данных (ObjectId)")
     full_name: str = Field(..., description="Полное имя пользователя")
     developer_name: Optional[str] = Field(None, description="Имя последнего разработчика, связанного с пользователем")
+    last_report_at: Optional[datetime] = Field(None, description="Дата и время создания последнего отчёта")
+    reports_count: int = Field(0, description="Количество неудалённых отчётов пользователя")
 
 class AuthRequest(BaseModel):
     initData: str = Field(..., description="Строка initData, которую передает Telegram Mini App")
@@ -0,0 +1,56 @@
+import os
+import asyncio
+import logging
+
+from app.database import redis, archive_reports
+from app.utils.feed_cache import bump_feed_generation
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "True").lower() in ("true", "1")
+ARCHIVE_INTERVAL = int(os.getenv("ARCHIVE_INTERVAL", 3600))
+ARCHIVE_LOCK_KEY = "task_reports_archive:lock"
+
+_archiver_task = None
+
+
+async def run_archive_once() -> int:
+    """
+    Один прогон архивации. Блокировка в Redis живёт весь интервал, поэтому
+    из всех воркеров прогон за интервал выполняет только один.
+    """
+    if not await redis.set(ARCHIVE_LOCK_KEY, "1", nx=True, ex=ARCHIVE_INTERVAL):
+        return 0
+    moved = await archive_reports()
+    if moved:
+        await bump_feed_generation()
+        logger.info("Archived %d reports", moved)
+    return moved
+
+
+async def _archive_loop():
+    while True:
+        try:
+            await run_archive_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Report archival failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+def start_archiver():
+    global _archiver_task
+    if ARCHIVE_ENABLED and (_archiver_task is None or _archiver_task.done()):
+        _archiver_task = asyncio.create_task(_archive_loop())
+
+
+async def stop_archiver():
+    global _archiver_task
+    if _archiver_task is not None:
+        _archiver_task.cancel()
+        try:
+            await _archiver_task
+        except asyncio.CancelledError:
+            pass
+        _archiver_task = None
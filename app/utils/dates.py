@@ -0,0 +1,12 @@
+from datetime import datetime, time, timedelta
+
+
+def date_to_condition(date_to: datetime) -> dict:
+    """
+    Условие на включительную верхнюю границу даты. Значение без времени
+    (YYYY-MM-DD парсится в полночь) означает весь этот день: $lt следующей
+    полуночи. Значение со временем сравнивается как есть через $lte.
+    """
+    if date_to.time() == time.min:
+        return {"$lt": date_to + timedelta(days=1)}
+    return {"$lte": date_to}
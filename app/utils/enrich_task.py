@@ -1,13 +1,140 @@
+import os
 import re
+import asyncio
+import logging
 
 from app.schemas import TaskInput
+from app.database import collection, change_stamp
+from app.utils.feed_cache import bump_feed_generation
+from app.utils.report_events import publish_report_event
+from app.utils.tracker import TRACKER_API_URL, get_tracker_resolver, resolve_tasks
+
+logger = logging.getLogger(__name__)
+
+TASK_ID_RE = re.compile(r'/t/([a-zA-Z0-9]+)')
+TASK_BUCKETS = ("yesterday", "today", "blockers")
+# off — только разбор ссылки; inline — метаданные трекера до записи отчёта;
+# background — после записи, чтобы ответ submit не ждал трекер
+TASK_ENRICHMENT_MODE = os.getenv("TASK_ENRICHMENT_MODE", "background" if TRACKER_API_URL else "off").lower()
+ENRICHMENT_SHUTDOWN_TIMEOUT = float(os.getenv("ENRICHMENT_SHUTDOWN_TIMEOUT", 5))
+
+_background_tasks: set = set()
+
 
 def enrich_task(task: TaskInput) -> dict:
-    match = re.search(r'/t/([a-zA-Z0-9]+)', str(task.url))
+    match = TASK_ID_RE.search(str(task.url))
     task_id = match.group(1) if match else "unknown"
     return {
         "url": str(task.url),
         "description": task.description,
         "task_id": task_id,
         "task_name": f"TASK {task_id}",
-    }
\ No newline at end of file
+    }
+
+
+async def enrich_report_tasks(report: dict):
+    """
+    Подставляет названия и статусы задач из трекера во все блоки отчёта:
+    задачи собираются в один пакетный запрос на отчёт. Возвращает только
+    изменившиеся блоки {bucket: [...]} (новые списки, report не меняется)
+    или пустой dict.
+    """
+    if get_tracker_resolver() is None:
+        return {}
+    task_ids = [
+        task["task_id"]
+        for bucket in TASK_BUCKETS
+        for task in report.get(bucket) or []
+        if task.get("task_id") not in (None, "unknown")
+    ]
+    if not task_ids:
+        return {}
+
+    metadata = await resolve_tasks(task_ids)
+    changed = {}
+    for bucket in TASK_BUCKETS:
+        tasks, bucket_changed = [], False
+        for task in report.get(bucket) or []:
+            meta = metadata.get(task.get("task_id"))
+            if meta:
+                enriched = dict(task)
+                if meta.get("title"):
+                    enriched["task_name"] = meta["title"]
+                if meta.get("status"):
+                    enriched["task_status"] = meta["status"]
+                bucket_changed = bucket_changed or enriched != task
+                task = enriched
+            tasks.append(task)
+        if bucket_changed:
+            changed[bucket] = tasks
+    return changed
+
+
+async def enrich_inline(report: dict) -> None:
+    """В режиме inline дополняет документ до записи; ошибки трекера не мешают сохранению."""
+    if TASK_ENRICHMENT_MODE != "inline":
+        return
+    try:
+        report.update(await enrich_report_tasks(report))
+    except Exception as e:
+        logger.warning("Inline task enrichment failed: %s", e)
+
+
+async def enrich_inline_many(reports: list) -> None:
+    """
+    enrich_inline для пакета: задачи всех отчётов разрешаются одним вызовом
+    трекера (дальше попадания в кэш), затем отчёты дополняются параллельно.
+    """
+    if TASK_ENRICHMENT_MODE != "inline" or get_tracker_resolver() is None or not reports:
+        return
+    task_ids = [
+        task["task_id"]
+        for report in reports
+        for bucket in TASK_BUCKETS
+        for task in report.get(bucket) or []
+        if task.get("task_id") not in (None, "unknown")
+    ]
+    try:
+        await resolve_tasks(task_ids)
+    except Exception as e:
+        logger.warning("Inline task enrichment failed: %s", e)
+    await asyncio.gather(*(enrich_inline(report) for report in reports))
+
+
+async def _enrich_stored(reports: list) -> None:
+    updated = False
+    for report in reports:
+        try:
+            changed = await enrich_report_tasks(report)
+            if not changed:
+                continue
+            # Условие на version: если отчёт успели поправить, его обогатит свой PATCH
+            result = await collection.update_one(
+                {"_id": report["_id"], "version": report.get("version", 1), "is_deleted": {"$ne": True}},
+                {"$set": {**changed, **await change_stamp()}},
+            )
+            if result.modified_count:
+                updated = True
+                await publish_report_event("updated", {**report, **changed})
+        except Exception:
+            logger.exception("Background enrichment of report %s failed", report.get("_id"))
+    if updated:
+        await bump_feed_generation()
+
+
+def schedule_enrichment(reports: list) -> None:
+    """В режиме background обогащает уже записанные отчёты отдельной задачей."""
+    if TASK_ENRICHMENT_MODE != "background" or get_tracker_resolver() is None or not reports:
+        return
+    task = asyncio.create_task(_enrich_stored(list(reports)))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def stop_enrichment() -> None:
+    """Даёт фоновым задачам доработать при остановке, затем отменяет оставшиеся."""
+    if not _background_tasks:
+        return
+    _, pending = await asyncio.wait(set(_background_tasks), timeout=ENRICHMENT_SHUTDOWN_TIMEOUT)
+    for task in pending:
+        task.cancel()
@@ -0,0 +1,77 @@
+import os
+import json
+import hashlib
+import logging
+
+from redis.exceptions import RedisError
+
+from app.database import redis
+from app.utils.metrics import cache_requests
+
+# 0 — кэш ленты отчётов выключен
+FEED_CACHE_TTL = int(os.getenv("FEED_CACHE_TTL", 60))
+FEED_GENERATION_KEY = "reports_feed:generation"
+
+logger = logging.getLogger(__name__)
+
+
+async def bump_feed_generation() -> None:
+    """
+    Инвалидирует все закэшированные страницы ленты: ключи содержат номер
+    поколения, поэтому после инкремента старые записи просто не читаются
+    и истекают по TTL.
+
+    Вызывается после записи в Mongo, поэтому ошибка Redis только логируется:
+    иначе сохранённый отчёт вернулся бы клиенту 500-й и был бы отправлен повторно.
+    Устаревшие страницы в этом случае доживут до FEED_CACHE_TTL.
+    """
+    try:
+        await redis.incr(FEED_GENERATION_KEY)
+    except RedisError as e:
+        logger.warning("Failed to invalidate reports feed cache: %s", e)
+
+
+async def get_feed_generation():
+    """
+    Текущее поколение ленты или None, если Redis недоступен: тогда кэш
+    не используется и ответ строится прямо из Mongo.
+    """
+    try:
+        return await redis.get(FEED_GENERATION_KEY) or "0"
+    except RedisError as e:
+        logger.warning("Reports feed cache unavailable, serving from Mongo: %s", e)
+        return None
+
+
+async def feed_cache_key(params: dict) -> tuple:
+    """
+    Возвращает (ключ Redis, ETag) для нормализованного набора параметров ленты.
+    ETag меняется только вместе с поколением, поэтому 304 можно отдать,
+    не читая сам ответ. Если Redis недоступен, возвращает (None, None).
+    """
+    generation = await get_feed_generation()
+    if generation is None:
+        return None, None
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:20]
+    return f"reports_feed:{generation}:{digest}", f'W/"{generation}-{digest}"'
+
+
+async def get_cached_feed(key: str):
+    if FEED_CACHE_TTL <= 0 or key is None:
+        return None
+    try:
+        body = await redis.get(key)
+    except RedisError as e:
+        logger.warning("Failed to read reports feed cache: %s", e)
+        return None
+    cache_requests.inc("reports_feed", "hit" if body is not None else "miss")
+    return body
+
+
+async def set_cached_feed(key: str, body: str) -> None:
+    if FEED_CACHE_TTL <= 0 or key is None:
+        return
+    try:
+        await redis.set(key, body, ex=FEED_CACHE_TTL)
+    except RedisError as e:
+        logger.warning("Failed to write reports feed cache: %s", e)
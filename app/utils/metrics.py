@@ -0,0 +1,168 @@
+import time
+import threading
+
+from pymongo import monitoring
+
+# Минимальная реализация метрик в текстовом формате Prometheus без внешних
+# зависимостей. Метрики живут в памяти процесса: при нескольких воркерах
+# каждый отдаёт свои значения, Prometheus различает их по instance/pod.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    for name, value in (extra or {}).items():
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name, self.documentation, self.labelnames = name, documentation, labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge с явным значением (inc/dec) или вычисляемый функцией при каждом scrape."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback=None):
+        self.name, self.documentation, self.labelnames = name, documentation, labelnames
+        self._values = {}
+        self._callback = callback
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        values = self._callback() if self._callback else self._values
+        for labels, value in list(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, labelnames
+        self.buckets = buckets
+        # labels -> [счётчики по бакетам..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, state in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, {'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, {'le': '+Inf'})} {state[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {state[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"),
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being handled")
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("command", "status"),
+)
+redis_command_duration = Histogram(
+    "redis_command_duration_seconds", "Redis command latency", ("command", "status"),
+)
+cache_requests = Counter("cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: латентность по шаблону маршрута (а не по сырому пути,
+    чтобы ID в URL не раздували число серий) и число запросов в работе.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status_code,
+            )
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Время команд Mongo по имени команды (вызывается из потоков pymongo)."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1_000_000, event.command_name, "ok")
+
+    def failed(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1_000_000, event.command_name, "error")
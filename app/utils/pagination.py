@@ -0,0 +1,48 @@
+import base64
+import json
+
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+
+def encode_cursor(created_at, oid: ObjectId) -> str:
+    """
+    Упаковывает позицию последнего отданного документа (created_at + _id)
+    в непрозрачную строку для клиента.
+    """
+    if isinstance(created_at, datetime):
+        value = {"t": "dt", "v": created_at.isoformat()}
+    else:
+        value = {"t": "raw", "v": created_at}
+    raw = json.dumps({"c": value, "i": str(oid)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple:
+    """
+    Обратная операция к encode_cursor. Возвращает (created_at, ObjectId).
+    Бросает HTTPException 400, если курсор повреждён.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = data["c"]
+        created_at = datetime.fromisoformat(value["v"]) if value["t"] == "dt" else value["v"]
+        return created_at, ObjectId(data["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(created_at, oid: ObjectId, sort_direction: int) -> dict:
+    """
+    Условие "строго после курсора" для сортировки по (created_at, _id).
+    """
+    op = "$lt" if sort_direction < 0 else "$gt"
+    return {
+        "$or": [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "_id": {op: oid}},
+        ]
+    }
@@ -0,0 +1,113 @@
+import os
+import math
+import logging
+
+from fastapi import Depends, HTTPException, Request
+from redis.exceptions import RedisError
+
+from app.database import redis
+from app.auth import get_user_from_jwt
+from app.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() in ("true", "1")
+RATE_LIMIT_PREFIX = "rate_limit:"
+
+rate_limited = Counter("rate_limited_total", "Requests rejected by the rate limiter", ("limit",))
+
+# Token bucket: ёмкость capacity, пополнение capacity за period секунд.
+# Проверка и списание — один EVALSHA; время берётся у Redis (TIME), чтобы
+# воркеры с расходящимися часами делили одно ведро.
+# Возвращает {1, 0}, если запрос пропущен, иначе {0, мс до следующего токена}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period_ms = tonumber(ARGV[2]) * 1000
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+
+local rate = capacity / period_ms
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = math.ceil((1 - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], period_ms)
+return {allowed, retry_after}
+"""
+
+_token_bucket = redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+
+def parse_limit(value: str) -> tuple:
+    """"10/60" -> (10, 60): не больше 10 запросов за 60 секунд (с равномерным пополнением)."""
+    count, _, period = value.partition("/")
+    return int(count), int(period or 60)
+
+
+# Лимиты по маршрутам; переопределяются переменными окружения того же имени
+RATE_LIMITS = {
+    "auth_ip": parse_limit(os.getenv("RATE_LIMIT_AUTH_IP", "30/60")),
+    "auth_chat": parse_limit(os.getenv("RATE_LIMIT_AUTH_CHAT", "10/60")),
+    "confirm_code_chat": parse_limit(os.getenv("RATE_LIMIT_CONFIRM_CODE_CHAT", "10/60")),
+    "submit_user": parse_limit(os.getenv("RATE_LIMIT_SUBMIT_USER", "30/60")),
+}
+
+
+async def check_rate_limit(name: str, principal) -> None:
+    """
+    Списывает токен из ведра (name, principal). Бросает HTTPException 429
+    с Retry-After, если ведро пусто. Если Redis недоступен, запрос пропускается:
+    ограничитель не должен ронять авторизацию.
+    """
+    if not RATE_LIMIT_ENABLED or principal is None:
+        return
+    capacity, period = RATE_LIMITS[name]
+    try:
+        allowed, retry_after_ms = await _token_bucket(
+            keys=[f"{RATE_LIMIT_PREFIX}{name}:{principal}"], args=[capacity, period],
+        )
+    except RedisError as e:
+        logger.warning("Rate limiter unavailable, letting request through: %s", e)
+        return
+    if not int(allowed):
+        rate_limited.inc(name)
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(int(retry_after_ms) / 1000)))},
+        )
+
+
+def client_ip(request: Request) -> str:
+    # start_api запускает uvicorn с proxy_headers: если запрос пришёл от адреса
+    # из FORWARDED_ALLOW_IPS, request.client — самый правый недоверенный адрес
+    # из X-Forwarded-For, иначе адрес самого соединения
+    return request.client.host if request.client else "unknown"
+
+
+def limit_by_ip(name: str):
+    async def dependency(request: Request):
+        await check_rate_limit(name, client_ip(request))
+    return dependency
+
+
+def limit_by_user(name: str):
+    async def dependency(user_payload: dict = Depends(get_user_from_jwt)):
+        await check_rate_limit(name, user_payload.get("user_id"))
+    return dependency
@@ -0,0 +1,85 @@
+import os
+import asyncio
+import logging
+
+from redis.exceptions import RedisError
+
+from app.database import redis, pubsub_redis
+from app.utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+REPORT_EVENTS_CHANNEL = "reports:events"
+# Сколько событий может ждать отправки одному клиенту
+REPORT_WS_QUEUE_SIZE = int(os.getenv("REPORT_WS_QUEUE_SIZE", 100))
+
+# Очереди подписчиков /ws/reports этого воркера
+subscribers = set()
+_listener_task = None
+
+
+async def publish_report_event(event: str, report: dict) -> None:
+    """
+    Публикует событие изменения отчёта (created / updated / deleted) для всех воркеров.
+    ObjectId и datetime в report кодируются при публикации.
+    Изменение уже записано в Mongo, поэтому ошибка Redis только логируется:
+    клиенты /ws/reports пропустят событие, но запрос не завершится 500-й.
+    """
+    try:
+        await redis.publish(REPORT_EVENTS_CHANNEL, dumps({"event": event, "report": report}))
+    except RedisError as e:
+        logger.warning("Failed to publish report %s event: %s", event, e)
+
+
+def subscribe() -> asyncio.Queue:
+    queue = asyncio.Queue(maxsize=REPORT_WS_QUEUE_SIZE)
+    subscribers.add(queue)
+    return queue
+
+
+def unsubscribe(queue: asyncio.Queue) -> None:
+    subscribers.discard(queue)
+
+
+def _fan_out(message: str) -> None:
+    for queue in list(subscribers):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: отключаем его, а не копим события.
+            # None в очереди — сигнал отправителю закрыть сокет.
+            unsubscribe(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+
+async def _listen_events():
+    while True:
+        pubsub = pubsub_redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(REPORT_EVENTS_CHANNEL)
+            async for event in pubsub.listen():
+                _fan_out(event["data"])
+        except RedisError:
+            logger.warning("Lost Redis pub/sub connection, resubscribing to %s", REPORT_EVENTS_CHANNEL)
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+def start_report_events_listener():
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen_events())
+
+
+async def stop_report_events_listener():
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
@@ -0,0 +1,50 @@
+import os
+import orjson
+
+from datetime import datetime
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Быстрый путь: документы Mongo кодируются одним проходом без jsonable_encoder
+# и валидации через response_model. FAST_JSON=0 возвращает прежний путь для сравнения.
+FAST_JSON = os.getenv("FAST_JSON", "True").lower() in ("true", "1")
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """JSON через orjson с поддержкой ObjectId (datetime orjson кодирует сам)."""
+    return orjson.dumps(content, default=_default)
+
+
+class BSONJSONResponse(JSONResponse):
+    """JSONResponse, который сам кодирует ObjectId и datetime."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+# Класс ответа роутеров по умолчанию: при FAST_JSON=0 — стандартный JSONResponse
+# FastAPI, чтобы сравнение путей кодирования затрагивало все эндпоинты
+DefaultJSONResponse = BSONJSONResponse if FAST_JSON else JSONResponse
+
+
+def json_response(content, status_code: int = 200, headers: dict = None) -> JSONResponse:
+    """
+    Готовый ответ для документов Mongo. При FAST_JSON отдаёт BSONJSONResponse,
+    иначе кодирует через jsonable_encoder, как FastAPI по умолчанию.
+    """
+    if FAST_JSON:
+        return BSONJSONResponse(content, status_code=status_code, headers=headers)
+    return JSONResponse(
+        jsonable_encoder(content, custom_encoder={ObjectId: str}),
+        status_code=status_code,
+        headers=headers,
+    )
@@ -0,0 +1,171 @@
+import os
+import time
+import asyncio
+import logging
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+import httpx
+
+from app.utils.metrics import cache_requests
+
+logger = logging.getLogger(__name__)
+
+# Шаблон адреса задачи в API трекера, например https://tracker.example.com/api/tasks/{task_id}
+TRACKER_API_URL = os.getenv("TRACKER_API_URL", "")
+TRACKER_API_TOKEN = os.getenv("TRACKER_API_TOKEN", "")
+TRACKER_TIMEOUT = float(os.getenv("TRACKER_TIMEOUT", 3))
+# Одновременных запросов к трекеру на один вызов resolve_many
+TRACKER_CONCURRENCY = int(os.getenv("TRACKER_CONCURRENCY", 8))
+TRACKER_MAX_CONNECTIONS = int(os.getenv("TRACKER_MAX_CONNECTIONS", 20))
+TASK_CACHE_SIZE = int(os.getenv("TASK_CACHE_SIZE", 5000))
+TASK_CACHE_TTL = int(os.getenv("TASK_CACHE_TTL", 600))
+
+
+class TaskMetadataCache:
+    """LRU с TTL: task_id -> {"title", "status"} или None (задачи нет в трекере)."""
+
+    def __init__(self, size: int = TASK_CACHE_SIZE, ttl: int = TASK_CACHE_TTL):
+        self.size, self.ttl = size, ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, task_id: str):
+        """Возвращает (найдено, значение): None тоже законно закэшированное значение."""
+        entry = self._entries.get(task_id)
+        if entry is None or entry[1] <= time.time():
+            self._entries.pop(task_id, None)
+            return False, None
+        self._entries.move_to_end(task_id)
+        return True, entry[0]
+
+    def put(self, task_id: str, value) -> None:
+        self._entries[task_id] = (value, time.time() + self.ttl)
+        self._entries.move_to_end(task_id)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TrackerResolver(ABC):
+    """
+    Источник метаданных задач. Для трекера с пакетным API достаточно
+    реализовать resolve_many; задачи, которых нет в ответе, считаются
+    временно недоступными и не кэшируются.
+    """
+
+    @abstractmethod
+    async def resolve_many(self, task_ids: list) -> dict:
+        """{task_id: {"title", "status"} | None (задачи нет в трекере)}."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class HTTPTrackerResolver(TrackerResolver):
+    """Запрос на задачу через общий пул httpx.AsyncClient, не больше concurrency одновременно."""
+
+    def __init__(
+        self,
+        url_template: str,
+        token: str = None,
+        concurrency: int = TRACKER_CONCURRENCY,
+        transport: httpx.AsyncBaseTransport = None,
+    ):
+        self.url_template = url_template
+        self.concurrency = concurrency
+        headers = {"Accept": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=TRACKER_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=TRACKER_MAX_CONNECTIONS,
+                max_keepalive_connections=TRACKER_MAX_CONNECTIONS,
+            ),
+            transport=transport,
+        )
+
+    @staticmethod
+    def parse_task(data: dict) -> dict:
+        status = data.get("status")
+        if isinstance(status, dict):
+            status = status.get("name") or status.get("key")
+        return {
+            "title": data.get("title") or data.get("name") or data.get("summary"),
+            "status": status,
+        }
+
+    async def _fetch(self, task_id: str):
+        response = await self._client.get(self.url_template.format(task_id=task_id))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return self.parse_task(response.json())
+
+    async def resolve_many(self, task_ids: list) -> dict:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(task_id):
+            async with semaphore:
+                return await self._fetch(task_id)
+
+        results = await asyncio.gather(*(one(task_id) for task_id in task_ids), return_exceptions=True)
+        resolved = {}
+        for task_id, result in zip(task_ids, results):
+            if isinstance(result, Exception):
+                logger.warning("Tracker lookup for %s failed: %s", task_id, result)
+                continue
+            resolved[task_id] = result
+        return resolved
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+task_metadata_cache = TaskMetadataCache()
+_resolver: TrackerResolver = HTTPTrackerResolver(TRACKER_API_URL, TRACKER_API_TOKEN) if TRACKER_API_URL else None
+
+
+def set_tracker_resolver(resolver: TrackerResolver) -> None:
+    """Подключает другой источник метаданных (или None, чтобы выключить обогащение)."""
+    global _resolver
+    _resolver = resolver
+    task_metadata_cache.clear()
+
+
+def get_tracker_resolver():
+    return _resolver
+
+
+async def resolve_tasks(task_ids) -> dict:
+    """
+    Метаданные задач из кэша, недостающие — одним пакетным вызовом резолвера.
+    Возвращает {task_id: {"title", "status"} | None} только для известных задач.
+    """
+    resolved, missing = {}, []
+    for task_id in dict.fromkeys(task_ids):
+        found, value = task_metadata_cache.get(task_id)
+        cache_requests.inc("task_metadata", "hit" if found else "miss")
+        if found:
+            resolved[task_id] = value
+        else:
+            missing.append(task_id)
+
+    if missing and _resolver is not None:
+        fetched = await _resolver.resolve_many(missing)
+        for task_id, value in fetched.items():
+            task_metadata_cache.put(task_id, value)
+        resolved.update(fetched)
+    return resolved
+
+
+async def close_tracker() -> None:
+    if _resolver is not None:
+        await _resolver.aclose()
@@ -0,0 +1,331 @@
+"""
+Нагрузочный прогон API в одном процессе.
+
+Приложение запускается через ASGI (httpx.ASGITransport) поверх локальных
+заменителей: mongomock-motor вместо Mongo и fakeredis (или настоящий
+redis-server через --redis-url) вместо Redis. Генерируются пользователи и
+отчёты за N месяцев, затем с заданной конкурентностью прогоняются сценарии
+auth, submit, reports, profile и ws_login.
+
+Результат — JSON с p50/p95/p99, RPS и пиковым RSS, чтобы сравнивать коммиты:
+
+    uv sync  # группа dev: mongomock-motor, fakeredis
+    uv run python -m benchmarks.bench_api --users 50 --months 6 --requests 500 --concurrency 20 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import hmac
+import random
+import asyncio
+import hashlib
+import argparse
+import resource
+import subprocess
+
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+SCENARIOS = ("auth", "submit", "reports", "profile", "ws_login")
+BENCH_BOT_TOKEN = "123456:bench-token"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="In-process API benchmark")
+    parser.add_argument("--users", type=int, default=20, help="Сколько пользователей сгенерировать")
+    parser.add_argument("--months", type=int, default=3, help="За сколько месяцев сгенерировать отчёты")
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=10, help="Одновременных запросов")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Сценарии через запятую")
+    parser.add_argument("--redis-url", default=None, help="redis://... вместо fakeredis")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Файл для JSON-результата (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+def install_fakes(redis_url: str = None):
+    """
+    Подменяет клиентов Mongo и Redis до импорта app, т.к. они создаются
+    на уровне модулей app.database.
+    """
+    try:
+        import mongomock_motor
+    except ImportError:
+        sys.exit("mongomock-motor is required: uv sync (dev group)")
+
+    import motor.motor_asyncio
+    import redis.asyncio
+
+    mongo_client = mongomock_motor.AsyncMongoMockClient()
+    motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: mongo_client
+
+    # app.database.in_memory наследуется от redis.asyncio.Redis, поэтому
+    # подставляется подкласс, игнорирующий host/port из окружения
+    if redis_url:
+        from redis.asyncio.connection import parse_url
+
+        class BenchRedis(redis.asyncio.Redis):
+            def __init__(self, *args, **kwargs):
+                super().__init__(**{**parse_url(redis_url), "decode_responses": True})
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            sys.exit("fakeredis is required (or pass --redis-url): uv sync (dev group)")
+        server = fakeredis.FakeServer()
+
+        class BenchRedis(fakeredis.FakeAsyncRedis):
+            def __init__(self, *args, **kwargs):
+                super().__init__(server=server, decode_responses=True)
+
+    redis.asyncio.Redis = BenchRedis
+
+
+def sign_init_data(user: dict) -> str:
+    params = {
+        "auth_date": str(int(time.time())),
+        "query_id": os.urandom(8).hex(),
+        "user": json.dumps(user, separators=(",", ":")),
+    }
+    data_check = "\n".join(f"{k}={params[k]}" for k in sorted(params))
+    secret = hmac.new(b"WebAppData", BENCH_BOT_TOKEN.encode(), hashlib.sha256).digest()
+    params["hash"] = hmac.new(secret, data_check.encode(), hashlib.sha256).hexdigest()
+    return urlencode(params)
+
+
+def make_task(rnd: random.Random) -> dict:
+    task_id = f"T{rnd.randint(1, 500)}"
+    return {
+        "url": f"https://tracker.example.com/t/{task_id}",
+        "description": f"Work on {task_id}",
+        "task_id": task_id,
+        "task_name": f"TASK {task_id}",
+    }
+
+
+async def seed(users: int, months: int, rnd: random.Random) -> list:
+    """Заполняет users и task_reports; возвращает список (user_id, chat_id)."""
+    from app.database import users_collection, collection
+
+    # mongomock игнорирует partialFilterExpression, и уникальный индекс
+    # ключей повтора начинает конфликтовать на отчётах без ключа
+    if "owner_idempotency_key" in await collection.index_information():
+        await collection.drop_index("owner_idempotency_key")
+
+    seeded = []
+    now = datetime.utcnow()
+    start = now - timedelta(days=30 * months)
+    for i in range(users):
+        chat_id = str(1_000_000 + i)
+        result = await users_collection.insert_one({
+            "chat_id": chat_id,
+            "username": f"bench_{i}",
+            "full_name": f"Bench User {i}",
+            "created_at": start,
+        })
+        seeded.append((result.inserted_id, chat_id))
+
+        reports = []
+        day = start
+        while day < now:
+            if day.weekday() < 5:
+                reports.append({
+                    "user_id": result.inserted_id,
+                    "date": day,
+                    "developer": f"Bench User {i}",
+                    "yesterday": [make_task(rnd) for _ in range(rnd.randint(1, 4))],
+                    "today": [make_task(rnd) for _ in range(rnd.randint(1, 4))],
+                    "blockers": [make_task(rnd) for _ in range(rnd.randint(0, 2))],
+                    "created_at": day + timedelta(hours=10, seconds=i),
+                    "version": 1,
+                })
+            day += timedelta(days=1)
+        if reports:
+            await collection.insert_many(reports)
+    return seeded
+
+
+async def ws_login(app, client) -> bool:
+    """Полный цикл входа: сокет /ws/login -> /service/confirm-code -> токен в сокете."""
+    inbound, outbound = asyncio.Queue(), asyncio.Queue()
+    scope = {
+        "type": "websocket",
+        "asgi": {"version": "3.0"},
+        "scheme": "ws",
+        "path": "/ws/login",
+        "raw_path": b"/ws/login",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "subprotocols": [],
+        "server": ("bench", 80),
+        "client": ("127.0.0.1", 0),
+    }
+    await inbound.put({"type": "websocket.connect"})
+    task = asyncio.create_task(app(scope, inbound.get, outbound.put))
+    try:
+        accepted = await outbound.get()
+        if accepted["type"] != "websocket.accept":
+            return False
+        session = json.loads((await outbound.get())["text"])
+        response = await client.post("/service/confirm-code", json={
+            "uuid": session["uuid"],
+            "chat_id": random.randint(2_000_000, 2_100_000),
+            "username": "bench_ws",
+            "full_name": "Bench WS",
+        })
+        if response.status_code != 200:
+            return False
+        message = json.loads((await asyncio.wait_for(outbound.get(), timeout=5))["text"])
+        return message.get("status") == "success"
+    finally:
+        await inbound.put({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(task, timeout=5)
+        except (asyncio.TimeoutError, Exception):
+            task.cancel()
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_scenario(name: str, call, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies), 3) if latencies else None,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+async def main(args) -> dict:
+    import jwt
+    import httpx
+
+    from app.main import app
+    from app.auth import JWT_SECRET, JWT_ALGORITHM
+
+    rnd = random.Random(args.seed)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        seed_started = time.perf_counter()
+        users = await seed(args.users, args.months, rnd)
+        seed_seconds = time.perf_counter() - seed_started
+
+        tokens = [
+            jwt.encode(
+                {"user_id": str(user_id), "chat_id": chat_id, "exp": int(time.time()) + 3600},
+                JWT_SECRET,
+                algorithm=JWT_ALGORITHM,
+            )
+            for user_id, chat_id in users
+        ]
+
+        def headers(i: int) -> dict:
+            return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def auth(i):
+                _, chat_id = users[i % len(users)]
+                init_data = sign_init_data({"id": int(chat_id), "first_name": "Bench"})
+                response = await client.post("/users/auth", json={"initData": init_data})
+                return response.status_code == 200
+
+            async def submit(i):
+                task = make_task(rnd)
+                response = await client.post("/tasks/submit", headers=headers(i), json={
+                    "date": datetime.utcnow().isoformat(),
+                    "developer": "bench",
+                    "yesterday": [{"url": task["url"], "description": task["description"]}],
+                    "today": [{"url": task["url"], "description": task["description"]}],
+                    "blockers": [],
+                })
+                return response.status_code == 201
+
+            async def reports(i):
+                response = await client.get("/tasks/reports", headers=headers(i))
+                return response.status_code == 200
+
+            async def profile(i):
+                response = await client.get("/users/profile", headers=headers(i))
+                return response.status_code == 200
+
+            async def login(i):
+                return await ws_login(app, client)
+
+            calls = {"auth": auth, "submit": submit, "reports": reports, "profile": profile, "ws_login": login}
+            for name in scenarios:
+                results[name] = await run_scenario(name, calls[name], args.requests, args.concurrency)
+
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            "users": args.users,
+            "months": args.months,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "redis": args.redis_url or "fakeredis",
+            "mongo": "mongomock-motor",
+        },
+        "seed_seconds": round(seed_seconds, 3),
+        "scenarios": results,
+        # ru_maxrss в Linux — в килобайтах
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Не setdefault: initData подписывается BENCH_BOT_TOKEN, и настоящий
+    # BOT_TOKEN из окружения провалил бы все запросы сценария auth
+    os.environ["BOT_TOKEN"] = BENCH_BOT_TOKEN
+    os.environ.setdefault("INIT_DATA_REPLAY_PROTECTION", "False")
+    # Иначе сценарии упираются в лимиты одного пользователя/chat_id
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+    install_fakes(args.redis_url)
+    report = json.dumps(asyncio.run(main(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
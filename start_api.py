@@ -1,10 +1,59 @@
+import os
+import logging
+import importlib.util
 import uvicorn
 
+# API_MODE=production — несколько воркеров, uvloop/httptools и ограничения
+# нагрузки; по умолчанию (development) один процесс с настройками uvicorn.
+API_MODE = os.getenv("API_MODE", "development").lower()
+
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def production_options() -> dict:
+    # limit_concurrency считается на воркер: сверх лимита uvicorn сразу
+    # отвечает 503, а не копит очередь, которая съест таймауты клиентов
+    limit_concurrency = int(os.getenv("API_LIMIT_CONCURRENCY", 1000))
+    limit_max_requests = int(os.getenv("API_LIMIT_MAX_REQUESTS", 0))
+    return {
+        "workers": int(os.getenv("API_WORKERS", os.cpu_count() or 1)),
+        "loop": "uvloop" if _has_module("uvloop") else "asyncio",
+        "http": "httptools" if _has_module("httptools") else "h11",
+        "timeout_keep_alive": int(os.getenv("API_KEEP_ALIVE", 75)),
+        "backlog": int(os.getenv("API_BACKLOG", 2048)),
+        # По SIGTERM воркер перестаёт принимать соединения и ждёт текущие
+        # запросы не дольше этого времени, затем выполняет shutdown lifespan
+        "timeout_graceful_shutdown": int(os.getenv("API_GRACEFUL_SHUTDOWN", 20)),
+        "limit_concurrency": limit_concurrency or None,
+        # Перезапуск воркера после N запросов (0 — выключено)
+        "limit_max_requests": limit_max_requests or None,
+        "access_log": os.getenv("API_ACCESS_LOG", "False").lower() in ("true", "1"),
+    }
+
+
 if __name__ == "__main__":
+    options = {"workers": int(os.getenv("API_WORKERS", 1))}
+    if API_MODE == "production":
+        options = production_options()
+
+    # X-Forwarded-For принимается только от этих адресов (через запятую,
+    # допустимы подсети): uvicorn берёт самый правый адрес цепочки, не входящий
+    # в список. "*" позволит любому клиенту подставить свой IP и обойти
+    # лимиты по IP, поэтому укажите адрес балансировщика.
+    forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS") or "127.0.0.1"
+    if API_MODE == "production" and not os.getenv("FORWARDED_ALLOW_IPS"):
+        logging.getLogger(__name__).warning(
+            "FORWARDED_ALLOW_IPS is not set: X-Forwarded-For is trusted only from 127.0.0.1, "
+            "behind a remote proxy all clients share the proxy's IP and its rate limits"
+        )
+
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
-        port=8000,
+        port=int(os.getenv("API_PORT", 8000)),
         proxy_headers=True,
-        forwarded_allow_ips="*"
-    )
\ No newline at end of file
+        forwarded_allow_ips=forwarded_allow_ips,
+        **options,
+    )
@@ -0,0 +1,9 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+async def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.aclose()
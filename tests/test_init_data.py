@@ -0,0 +1,146 @@
+import hashlib
+import hmac
+import importlib
+import json
+import time
+from functools import partial
+from urllib.parse import urlencode
+
+import httpx
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI, HTTPException
+from redis.exceptions import ConnectionError
+
+from app.auth import init_data_resolver
+from app.auth.init_data_resolver import verify_telegram_init_data
+from app.utils import rate_limit
+
+# app.routers.users в пакете перекрыт объектом router
+users = importlib.import_module("app.routers.users")
+
+BOT_TOKEN = "123456:test-token"
+USER = {"id": 42, "first_name": "John", "username": "john"}
+
+
+def sign(params: dict, token: str = BOT_TOKEN) -> str:
+    """initData так, как его подписывает Telegram."""
+    data_check = "\n".join(f"{k}={params[k]}" for k in sorted(params))
+    secret = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+    return urlencode({**params, "hash": hmac.new(secret, data_check.encode(), hashlib.sha256).hexdigest()})
+
+
+def init_data(auth_date: int = None, **extra) -> dict:
+    return {
+        "auth_date": str(int(time.time()) if auth_date is None else auth_date),
+        "query_id": "AAHdF6IQAAAAAN0XohDhrOrc",
+        "user": json.dumps(USER, separators=(",", ":")),
+        **extra,
+    }
+
+
+def assert_rejected(detail: str, *args, **kwargs):
+    with pytest.raises(HTTPException) as exc:
+        verify_telegram_init_data(*args, bot_token=BOT_TOKEN, **kwargs)
+    assert exc.value.status_code == 401
+    assert exc.value.detail == detail
+
+
+def test_valid_init_data():
+    params = verify_telegram_init_data(sign(init_data()), bot_token=BOT_TOKEN)
+    assert params["user"] == USER
+    assert params["query_id"] == "AAHdF6IQAAAAAN0XohDhrOrc"
+    assert params["hash"]
+
+
+def test_tampered_init_data_is_rejected():
+    signed = sign(init_data())
+    assert_rejected("Invalid signature in initData", signed.replace("John", "Jane"))
+
+
+def test_foreign_bot_token_is_rejected():
+    assert_rejected("Invalid signature in initData", sign(init_data(), token="654321:other-token"))
+
+
+def test_missing_hash_is_rejected():
+    assert_rejected("No hash in initData", urlencode(init_data()))
+
+
+def test_missing_auth_date_is_rejected():
+    params = init_data()
+    del params["auth_date"]
+    assert_rejected("No auth_date in initData", sign(params))
+
+
+def test_expired_init_data_is_rejected(monkeypatch):
+    monkeypatch.setattr(init_data_resolver, "INIT_DATA_MAX_AGE", 60)
+    assert verify_telegram_init_data(sign(init_data(int(time.time()) - 30)), bot_token=BOT_TOKEN)
+    assert_rejected("initData expired", sign(init_data(int(time.time()) - 120)))
+
+
+@pytest.fixture
+async def auth_client(monkeypatch, fake_redis):
+    """POST /users/auth с Redis на fakeredis и без Mongo."""
+    async def get_or_create_user(chat_id, username, full_name, referred_by=None):
+        return ObjectId()
+
+    monkeypatch.setattr(init_data_resolver, "redis", fake_redis)
+    monkeypatch.setattr(init_data_resolver, "INIT_DATA_REPLAY_PROTECTION", True)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "_token_bucket", fake_redis.register_script(rate_limit.TOKEN_BUCKET_SCRIPT))
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "auth_chat", (10, 60))
+    monkeypatch.setattr(users, "verify_telegram_init_data", partial(verify_telegram_init_data, bot_token=BOT_TOKEN))
+    monkeypatch.setattr(users, "get_or_create_user", get_or_create_user)
+
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def auth(client, signed: str) -> httpx.Response:
+    return await client.post("/users/auth", json={"initData": signed})
+
+
+async def test_auth_issues_token(auth_client):
+    response = await auth(auth_client, sign(init_data()))
+    assert response.status_code == 200
+    assert response.json()["user"]["chat_id"] == USER["id"]
+
+
+async def test_replayed_init_data_is_rejected(auth_client):
+    signed = sign(init_data())
+    assert (await auth(auth_client, signed)).status_code == 200
+
+    response = await auth(auth_client, signed)
+    assert response.status_code == 401
+    assert response.json() == {"error": "initData already used"}
+
+
+async def test_throttled_init_data_can_be_retried(auth_client, monkeypatch, fake_redis):
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "auth_chat", (1, 60))
+    assert (await auth(auth_client, sign(init_data(query_id="first")))).status_code == 200
+
+    signed = sign(init_data(query_id="second"))
+    response = await auth(auth_client, signed)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Ведро снова полно: тот же initData не должен считаться использованным
+    await fake_redis.delete(f"{rate_limit.RATE_LIMIT_PREFIX}auth_chat:{USER['id']}")
+    assert (await auth(auth_client, signed)).status_code == 200
+
+
+async def test_rejected_signature_is_not_marked_used(auth_client, fake_redis):
+    response = await auth(auth_client, sign(init_data(), token="654321:other-token"))
+    assert response.status_code == 401
+    assert await fake_redis.keys(f"{init_data_resolver.INIT_DATA_SEEN_PREFIX}*") == []
+
+
+async def test_auth_works_without_redis(auth_client, monkeypatch, fake_redis):
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(fake_redis, "set", unavailable)
+    monkeypatch.setattr(rate_limit, "_token_bucket", unavailable)
+    assert (await auth(auth_client, sign(init_data()))).status_code == 200
@@ -0,0 +1,61 @@
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+
+from app.auth import jwt_resolver
+from app.auth import JWT_ALGORITHM, JWT_SECRET
+from app.auth.jwt_resolver import get_user_from_jwt, revoke_token
+
+
+def bearer(**claims) -> str:
+    payload = {"user_id": "6631b3c1d2f4a5b6c7d8e9f0", "exp": int(time.time()) + 600, **claims}
+    return "Bearer " + jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+@pytest.fixture
+def shared(monkeypatch, fake_redis):
+    monkeypatch.setattr(jwt_resolver, "redis", fake_redis)
+    monkeypatch.setattr(jwt_resolver, "JWT_CACHE_SHARED", True)
+    return fake_redis
+
+
+async def test_payload_is_cached():
+    header = bearer(n=1)
+    hits = jwt_resolver.jwt_cache_stats["hits"]
+    assert (await get_user_from_jwt(header))["n"] == 1
+    assert (await get_user_from_jwt(header))["n"] == 1
+    assert jwt_resolver.jwt_cache_stats["hits"] == hits + 1
+
+
+async def test_expired_token_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        await get_user_from_jwt(bearer(exp=int(time.time()) - 10))
+    assert exc.value.detail == "Token expired"
+
+
+async def test_revoked_token_is_rejected_until_exp(shared):
+    header = bearer(n=2)
+    payload = await get_user_from_jwt(header)
+    await revoke_token(header[7:], payload["exp"])
+
+    with pytest.raises(HTTPException) as exc:
+        await get_user_from_jwt(header)
+    assert exc.value.detail == "Token revoked"
+    assert 0 < await shared.ttl(f"{jwt_resolver.JWT_REVOKED_PREFIX}{jwt_resolver._token_digest(header[7:])}") <= 600
+
+
+async def test_revocation_check_fails_open(monkeypatch, shared):
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(shared, "exists", unavailable)
+    monkeypatch.setattr(shared, "set", unavailable)
+    header = bearer(n=3)
+    assert (await get_user_from_jwt(header))["n"] == 3
+
+    with pytest.raises(HTTPException) as exc:
+        await revoke_token(header[7:])
+    assert exc.value.status_code == 503
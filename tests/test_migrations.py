@@ -0,0 +1,72 @@
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from app.database import indexes, migrations
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = AsyncMongoMockClient().db
+
+    async def compute_user_report_stats(user_oid):
+        return {"reports_count": await db.task_reports.count_documents({"user_id": user_oid})}
+
+    monkeypatch.setattr(migrations, "users_collection", db.users)
+    monkeypatch.setattr(migrations, "collection", db.task_reports)
+    monkeypatch.setattr(migrations, "archive_collection", db.task_reports_archive)
+    monkeypatch.setattr(migrations, "compute_user_report_stats", compute_user_report_stats)
+    monkeypatch.setattr(indexes, "users_collection", db.users)
+    monkeypatch.setattr(indexes, "collection", db.task_reports)
+    monkeypatch.setattr(indexes, "archive_collection", db.task_reports_archive)
+    return db
+
+
+async def test_duplicate_users_are_merged_into_the_oldest(db):
+    first, second, third, other = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    await db.users.insert_many([
+        {"_id": second, "chat_id": "42"},
+        {"_id": first, "chat_id": "42"},
+        {"_id": third, "chat_id": "42"},
+        {"_id": other, "chat_id": "43"},
+    ])
+    await db.task_reports.insert_many([{"user_id": first}, {"user_id": second}, {"user_id": other}])
+    await db.task_reports_archive.insert_one({"user_id": third})
+
+    assert await migrations.dedupe_users_by_chat_id() == 2
+
+    assert [user["_id"] for user in await db.users.find().sort("_id").to_list(None)] == [first, other]
+    assert await db.task_reports.count_documents({"user_id": first}) == 2
+    assert await db.task_reports_archive.count_documents({"user_id": first}) == 1
+    assert (await db.users.find_one({"_id": first}))["reports_count"] == 2
+    assert await migrations.dedupe_users_by_chat_id() == 0
+
+
+async def test_unique_chat_id_index_after_dedupe(db):
+    await db.users.insert_many([{"chat_id": "42"}, {"chat_id": "42"}])
+    await migrations.dedupe_users_by_chat_id()
+    await indexes.ensure_indexes()
+    assert "chat_id_unique" in await db.users.index_information()
+
+
+async def test_failed_index_does_not_block_the_others(db, monkeypatch):
+    broken = IndexModel([("broken", 1)], name="broken")
+    monkeypatch.setattr(indexes, "REPORTS_INDEXES", [broken, *indexes.REPORTS_INDEXES[:2]])
+    create_indexes = type(db.task_reports).create_indexes
+
+    async def failing_create_indexes(self, models, *args, **kwargs):
+        if models[0] is broken:
+            raise OperationFailure("index options conflict")
+        return await create_indexes(self, models, *args, **kwargs)
+
+    monkeypatch.setattr(type(db.task_reports), "create_indexes", failing_create_indexes)
+    await indexes.ensure_indexes()
+    assert {"feed_created_at", "owner_created_at"} <= set(await db.task_reports.index_information())
+
+
+async def test_startup_fails_without_unique_chat_id(db):
+    await db.users.insert_many([{"chat_id": "42"}, {"chat_id": "42"}])
+    with pytest.raises(RuntimeError, match="chat_id_unique"):
+        await indexes.ensure_indexes()
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_filter
+
+
+@pytest.mark.parametrize("created_at", [
+    datetime(2024, 5, 19, 13, 32, 0, 123456),
+    "2024-05-19T13:32:00",
+    0.8731,
+])
+def test_cursor_round_trip(created_at):
+    oid = ObjectId()
+    assert decode_cursor(encode_cursor(created_at, oid)) == (created_at, oid)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime(2024, 5, 19), ObjectId())
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2024, 5, 19), ObjectId())[:-4]])
+def test_broken_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+@pytest.fixture
+def reports():
+    collection = mongomock.MongoClient().db.task_reports
+    start = datetime(2024, 5, 1)
+    # По три отчёта на одно created_at: страница должна разрезать группу по _id
+    collection.insert_many([{"created_at": start + timedelta(days=i // 3)} for i in range(10)])
+    return collection
+
+
+@pytest.mark.parametrize("sort_direction", [-1, 1])
+def test_keyset_pages_cover_all_documents_once(reports, sort_direction):
+    sort = [("created_at", sort_direction), ("_id", sort_direction)]
+    expected = [doc["_id"] for doc in reports.find().sort(sort)]
+
+    seen, query = [], {}
+    while True:
+        page = list(reports.find(query).sort(sort).limit(4))
+        if not page:
+            break
+        seen += [doc["_id"] for doc in page]
+        created_at, oid = decode_cursor(encode_cursor(page[-1]["created_at"], page[-1]["_id"]))
+        query = keyset_filter(created_at, oid, sort_direction)
+
+    assert seen == expected
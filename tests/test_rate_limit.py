@@ -0,0 +1,50 @@
+import pytest
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+
+from app.utils import rate_limit
+from app.utils.rate_limit import TOKEN_BUCKET_SCRIPT, check_rate_limit, parse_limit
+
+
+@pytest.fixture
+def bucket(monkeypatch, fake_redis):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "_token_bucket", fake_redis.register_script(TOKEN_BUCKET_SCRIPT))
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "auth_chat", (3, 60))
+    return fake_redis
+
+
+def test_parse_limit():
+    assert parse_limit("10/60") == (10, 60)
+    assert parse_limit("5") == (5, 60)
+
+
+async def test_empty_bucket_returns_429_with_retry_after(bucket):
+    for _ in range(3):
+        await check_rate_limit("auth_chat", 42)
+
+    with pytest.raises(HTTPException) as exc:
+        await check_rate_limit("auth_chat", 42)
+    assert exc.value.status_code == 429
+    # Ёмкость 3 за 60 с: следующий токен появится не позже чем через 20 с
+    assert 1 <= int(exc.value.headers["Retry-After"]) <= 20
+
+
+async def test_buckets_are_per_principal(bucket):
+    for _ in range(3):
+        await check_rate_limit("auth_chat", 42)
+    await check_rate_limit("auth_chat", 43)
+
+
+async def test_anonymous_principal_is_not_limited(bucket):
+    for _ in range(5):
+        await check_rate_limit("auth_chat", None)
+
+
+async def test_redis_failure_lets_request_through(monkeypatch):
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "_token_bucket", unavailable)
+    await check_rate_limit("auth_chat", 42)
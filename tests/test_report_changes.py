@@ -0,0 +1,110 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from app.routers import tasks
+
+NOW = datetime(2024, 5, 19, 12, 0, 0)
+SETTLED = NOW - timedelta(minutes=1)
+FRESH = NOW - timedelta(milliseconds=100)
+
+
+@pytest.fixture
+def reports(monkeypatch):
+    collection = AsyncMongoMockClient().db.task_reports
+
+    async def server_time():
+        return NOW
+
+    monkeypatch.setattr(tasks, "collection", collection)
+    monkeypatch.setattr(tasks, "server_time", server_time)
+    monkeypatch.setattr(tasks, "CHANGES_PAGE_MAX", 500)
+    return collection
+
+
+async def insert(collection, *changes, user_id=None):
+    await collection.insert_many([
+        {"_id": ObjectId(), "user_id": user_id or ObjectId(), "change_seq": seq, "changed_at": changed_at}
+        for seq, changed_at in changes
+    ])
+
+
+async def fetch(since=None, limit=100, owner_id=None) -> dict:
+    response = await tasks.get_report_changes(since=since, owner_id=owner_id, limit=limit, user_payload={})
+    body = json.loads(response.body)
+    body["seqs"] = [item["change_seq"] for item in body["items"]]
+    return body
+
+
+async def test_contiguous_changes_are_delivered_even_if_fresh(reports):
+    await insert(reports, (1, SETTLED), (2, FRESH), (3, FRESH))
+    body = await fetch()
+    assert body["seqs"] == [1, 2, 3]
+    assert body["next_token"] == "3"
+
+
+async def test_fresh_gap_holds_back_the_rest(reports):
+    await insert(reports, (1, SETTLED), (2, SETTLED), (4, FRESH), (5, FRESH))
+    body = await fetch()
+    assert body["seqs"] == [1, 2]
+    assert body["next_token"] == "2"
+    assert body["has_more"] is False
+
+
+async def test_fresh_gap_right_after_token_returns_nothing(reports):
+    await insert(reports, (3, FRESH))
+    body = await fetch(since="1")
+    assert body["seqs"] == []
+    assert body["next_token"] == "1"
+
+
+async def test_settled_gap_is_skipped(reports):
+    await insert(reports, (1, SETTLED), (4, SETTLED), (5, FRESH))
+    body = await fetch()
+    assert body["seqs"] == [1, 4, 5]
+    assert body["next_token"] == "5"
+
+
+async def test_gap_filled_later_is_delivered(reports):
+    await insert(reports, (1, SETTLED), (3, FRESH))
+    assert (await fetch())["next_token"] == "1"
+
+    await insert(reports, (2, FRESH))
+    body = await fetch(since="1")
+    assert body["seqs"] == [2, 3]
+
+
+async def test_page_limit_sets_has_more(reports):
+    await insert(reports, *((seq, SETTLED) for seq in range(1, 6)))
+    body = await fetch(limit=2)
+    assert body["seqs"] == [1, 2]
+    assert body["has_more"] is True
+    assert (await fetch(since=body["next_token"], limit=10))["seqs"] == [3, 4, 5]
+
+
+async def test_owner_filter_waits_only_for_fresh_gaps(reports):
+    owner = ObjectId()
+    await insert(reports, (2, SETTLED), (4, FRESH), (5, FRESH))
+    await insert(reports, (1, SETTLED), (3, SETTLED), (6, FRESH), user_id=owner)
+
+    body = await fetch(owner_id=str(owner))
+    assert body["seqs"] == [1, 3]
+    assert body["next_token"] == "3"
+
+
+async def test_deleted_reports_are_tombstones(reports):
+    await reports.insert_one({
+        "_id": ObjectId(), "user_id": ObjectId(), "developer": "dev",
+        "change_seq": 1, "changed_at": SETTLED, "is_deleted": True, "deleted_at": SETTLED,
+    })
+    item = (await fetch())["items"][0]
+    assert set(item) == {"_id", "is_deleted", "deleted_at", "change_seq"}
+
+
+async def test_invalid_token_is_rejected(reports):
+    with pytest.raises(tasks.HTTPException) as exc:
+        await fetch(since="abc")
+    assert exc.value.status_code == 400
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from app.routers import tasks
+from app.utils import enrich_task
+
+USER_ID = str(ObjectId())
+
+
+def item(key=None, **overrides) -> dict:
+    report = {
+        "date": "2024-05-19",
+        "developer": "dev",
+        "yesterday": [{"url": "https://tracker.example.com/t/AB1", "description": "Payment migration"}],
+        "today": [],
+        "blockers": [],
+        **overrides,
+    }
+    if key is not None:
+        report["idempotency_key"] = key
+    return report
+
+
+@pytest.fixture
+async def reports(monkeypatch):
+    collection = AsyncMongoMockClient().db.task_reports
+    await collection.create_index([("user_id", 1), ("idempotency_key", 1)], unique=True)
+    seq = {"value": 0}
+
+    async def next_change_seq(count=1):
+        seq["value"] += count
+        return seq["value"] - count + 1, None
+
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(tasks, "collection", collection)
+    monkeypatch.setattr(tasks, "next_change_seq", next_change_seq)
+    for name in ("record_reports_created", "bump_feed_generation", "publish_report_event"):
+        monkeypatch.setattr(tasks, name, noop)
+    monkeypatch.setattr(tasks, "schedule_enrichment", lambda reports: None)
+    return collection
+
+
+async def submit(items: list) -> dict:
+    return await tasks.submit_batch(items=items, user_payload={"user_id": USER_ID})
+
+
+async def test_repeated_key_in_batch_is_inserted_once(reports):
+    result = await submit([item("a"), item("b"), item("a")])
+
+    assert [r["index"] for r in result["inserted"]] == [0, 1]
+    assert result["duplicates"] == [{"index": 2, "inserted_id": result["inserted"][0]["inserted_id"]}]
+    assert await reports.count_documents({}) == 2
+
+
+async def test_retried_batch_reports_existing_ids(reports):
+    first = await submit([item("a"), item("b")])
+    retry = await submit([item("a"), item("c"), item("b")])
+
+    assert [r["index"] for r in retry["inserted"]] == [1]
+    assert retry["duplicates"] == [
+        {"index": 0, "inserted_id": first["inserted"][0]["inserted_id"]},
+        {"index": 2, "inserted_id": first["inserted"][1]["inserted_id"]},
+    ]
+    assert retry["errors"] == []
+    assert await reports.count_documents({}) == 3
+
+
+async def test_invalid_items_do_not_block_the_batch(reports):
+    result = await submit([item("a"), item("b", date="not-a-date"), {"developer": "dev"}, item("a"), item("c")])
+
+    assert [r["index"] for r in result["inserted"]] == [0, 4]
+    assert [d["index"] for d in result["duplicates"]] == [3]
+    assert [e["index"] for e in result["errors"]] == [1, 2]
+    assert await reports.count_documents({}) == 2
+
+
+async def test_change_seq_follows_batch_order(reports):
+    await submit([item("a"), item("b"), item("c")])
+    docs = await reports.find().sort("change_seq", 1).to_list(None)
+    assert [doc["idempotency_key"] for doc in docs] == ["a", "b", "c"]
+
+
+async def test_inline_enrichment_runs_concurrently(reports, monkeypatch):
+    running = {"now": 0, "max": 0}
+
+    async def enrich_inline(report):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        report["enriched"] = True
+
+    async def resolve_tasks(task_ids):
+        return {}
+
+    monkeypatch.setattr(enrich_task, "TASK_ENRICHMENT_MODE", "inline")
+    monkeypatch.setattr(enrich_task, "get_tracker_resolver", lambda: object())
+    monkeypatch.setattr(enrich_task, "resolve_tasks", resolve_tasks)
+    monkeypatch.setattr(enrich_task, "enrich_inline", enrich_inline)
+
+    await submit([item(str(i)) for i in range(5)])
+    assert running["max"] == 5
+    assert await reports.count_documents({"enriched": True}) == 5
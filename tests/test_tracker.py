@@ -0,0 +1,84 @@
+import httpx
+import pytest
+
+from app.utils import tracker
+from app.utils.tracker import HTTPTrackerResolver, TaskMetadataCache, TrackerResolver, resolve_tasks
+
+TRACKER_URL = "https://tracker.test/api/tasks/{task_id}"
+
+
+class FakeTracker:
+    """Обработчик httpx.MockTransport: отвечает по словарю задач и считает запросы."""
+
+    def __init__(self, tasks: dict):
+        self.tasks = tasks
+        self.failing = set()
+        self.calls = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        task_id = request.url.path.rsplit("/", 1)[-1]
+        self.calls.append(task_id)
+        if task_id in self.failing:
+            return httpx.Response(503)
+        if task_id not in self.tasks:
+            return httpx.Response(404)
+        return httpx.Response(200, json=self.tasks[task_id])
+
+
+@pytest.fixture
+async def fake_tracker():
+    fake = FakeTracker({"AB1": {"title": "Payment migration", "status": {"name": "In progress"}}})
+    resolver = HTTPTrackerResolver(TRACKER_URL, transport=httpx.MockTransport(fake))
+    tracker.set_tracker_resolver(resolver)
+    yield fake
+    tracker.set_tracker_resolver(None)
+    await resolver.aclose()
+
+
+def test_resolver_is_abstract():
+    with pytest.raises(TypeError):
+        TrackerResolver()
+
+
+async def test_cache_hit_skips_tracker(fake_tracker):
+    expected = {"AB1": {"title": "Payment migration", "status": "In progress"}}
+    assert await resolve_tasks(["AB1"]) == expected
+    assert await resolve_tasks(["AB1"]) == expected
+    assert fake_tracker.calls == ["AB1"]
+
+
+async def test_missing_task_is_cached(fake_tracker):
+    assert await resolve_tasks(["NOPE"]) == {"NOPE": None}
+    assert await resolve_tasks(["NOPE"]) == {"NOPE": None}
+    assert fake_tracker.calls == ["NOPE"]
+
+
+async def test_failed_lookup_is_retried(fake_tracker):
+    fake_tracker.failing.add("AB1")
+    assert await resolve_tasks(["AB1"]) == {}
+
+    fake_tracker.failing.clear()
+    assert await resolve_tasks(["AB1"]) == {"AB1": {"title": "Payment migration", "status": "In progress"}}
+    assert fake_tracker.calls == ["AB1", "AB1"]
+
+
+def test_cache_entry_expires(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(tracker.time, "time", lambda: now)
+    cache = TaskMetadataCache(size=10, ttl=60)
+    cache.put("AB1", {"title": "t", "status": None})
+    assert cache.get("AB1") == (True, {"title": "t", "status": None})
+
+    now += 61
+    assert cache.get("AB1") == (False, None)
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TaskMetadataCache(size=2, ttl=60)
+    cache.put("AB1", None)
+    cache.put("AB2", None)
+    cache.get("AB1")
+    cache.put("AB3", None)
+    assert cache.get("AB2") == (False, None)
+    assert cache.get("AB1") == (True, None)
@@ -0,0 +1,31 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.database import users_repository
+from app.database.users_repository import get_or_create_user
+
+
+@pytest.fixture
+def users(monkeypatch):
+    collection = AsyncMongoMockClient().db.users
+    monkeypatch.setattr(users_repository, "users_collection", collection)
+    monkeypatch.setattr(users_repository, "USER_ID_CACHE_SIZE", 2)
+    users_repository.clear_user_id_cache()
+    yield collection
+    users_repository.clear_user_id_cache()
+
+
+async def test_same_chat_id_returns_same_user(users):
+    first = await get_or_create_user(42, "john", "John")
+    users_repository.clear_user_id_cache()
+    assert await get_or_create_user("42") == first
+    assert await users.count_documents({}) == 1
+
+
+async def test_full_cache_evicts_least_recently_used(users):
+    await get_or_create_user(1)
+    await get_or_create_user(2)
+    await get_or_create_user(1)
+    await get_or_create_user(3)
+
+    assert list(users_repository._user_id_cache) == ["1", "3"]